@@ -0,0 +1,77 @@
+"""
+Однократная подготовка базы данных: создание БД и применение миграций alembic.
+
+Запускается отдельным шагом при деплое (`python bootstrap.py`) либо один раз
+при старте процесса, если DB_CREATED=false. В обработке запросов не участвует.
+"""
+import os
+import threading
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from alembic import command
+from alembic.config import Config
+from settings import get_settings
+
+st = get_settings()
+
+# Ключ advisory-lock'а, чтобы воркеры разных процессов не выполняли подготовку одновременно
+BOOTSTRAP_LOCK_ID = 7_316_540_001
+
+_lock = threading.Lock()
+_bootstrapped = False
+
+def _connect_maintenance_db():
+    # Подключаемся к базе postgres вместо целевой базы данных
+    conn = psycopg2.connect(
+        host=st.POSTGRES_HOST,
+        port=st.POSTGRES_PORT,
+        database="postgres",  # Используем стандартную базу postgres для подключения
+        user=st.POSTGRES_USER,
+        password=st.POSTGRES_PASSWORD
+    )
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    return conn
+
+def create_db(conn):
+    cur = conn.cursor()
+    try:
+        # Проверяем, существует ли база данных
+        cur.execute("SELECT 1 FROM pg_catalog.pg_database WHERE datname = %s", (st.POSTGRES_DB,))
+        exists = cur.fetchone()
+        
+        if not exists:
+            cur.execute(f'CREATE DATABASE "{st.POSTGRES_DB}"')
+            print(f'База данных {st.POSTGRES_DB} успешно создана')
+        else:
+            print(f'База данных {st.POSTGRES_DB} уже существует')
+    finally:
+        cur.close()
+
+def run_migrations():
+    config = Config(os.path.join(st.BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(st.BASE_DIR, "migrations"))
+    command.upgrade(config, "head")
+
+def bootstrap_db():
+    """Создает БД и применяет миграции, не чаще одного раза на процесс"""
+    global _bootstrapped
+    with _lock:
+        if _bootstrapped:
+            return
+        conn = _connect_maintenance_db()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT pg_advisory_lock(%s)", (BOOTSTRAP_LOCK_ID,))
+            try:
+                create_db(conn)
+                run_migrations()
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (BOOTSTRAP_LOCK_ID,))
+        finally:
+            cur.close()
+            conn.close()
+        _bootstrapped = True
+
+
+if __name__ == "__main__":
+    bootstrap_db()
@@ -1,54 +1,125 @@
-from sqlalchemy import create_engine
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from settings import get_settings
-import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+import threading
+import time
 
 st = get_settings()
 
-def create_db():
-    # Подключаемся к базе postgres вместо целевой базы данных
-    conn = psycopg2.connect(
-        host=st.POSTGRES_HOST,
-        port=st.POSTGRES_PORT,
-        database="postgres",  # Используем стандартную базу postgres для подключения
-        user=st.POSTGRES_USER,
-        password=st.POSTGRES_PASSWORD
-    )
-    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-
-    cur = conn.cursor()
-    try:
-        # Проверяем, существует ли база данных
-        cur.execute(f"SELECT 1 FROM pg_catalog.pg_database WHERE datname = '{st.POSTGRES_DB}'")
-        exists = cur.fetchone()
-        
-        if not exists:
-            cur.execute(f'CREATE DATABASE {st.POSTGRES_DB}')
-            print(f'База данных {st.POSTGRES_DB} успешно создана')
-        else:
-            print(f'База данных {st.POSTGRES_DB} уже существует')
-            
-    except Exception as e:
-        print(f'Ошибка при создании базы данных: {e}')
-    finally:
-        cur.close()
-        conn.close()
-
+# Синхронный URL (psycopg2) используется alembic'ом, асинхронный (asyncpg) - приложением
 SQLALCHEMY_DATABASE_URL = f"postgresql://{st.POSTGRES_USER}:{st.POSTGRES_PASSWORD}@{st.POSTGRES_HOST}:{st.POSTGRES_PORT}/{st.POSTGRES_DB}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{st.POSTGRES_USER}:{st.POSTGRES_PASSWORD}@{st.POSTGRES_HOST}:{st.POSTGRES_PORT}/{st.POSTGRES_DB}"
+
+class PoolMetrics:
+    """Счетчики пула соединений: ожидание выдачи соединения и возраст открытых соединений"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connected_at = {}
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_last = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_last = seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def connected(self, key: int):
+        with self._lock:
+            self._connected_at[key] = time.monotonic()
+
+    def closed(self, key: int):
+        with self._lock:
+            self._connected_at.pop(key, None)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - created for created in self._connected_at.values()]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "wait_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+                "wait_max": self.wait_max,
+                "wait_last": self.wait_last,
+                "connections_open": len(ages),
+                "connection_age_avg": sum(ages) / len(ages) if ages else 0.0,
+                "connection_age_max": max(ages, default=0.0),
+            }
+
+pool_metrics = PoolMetrics()
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий время ожидания свободного соединения"""
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        except Exception:
+            pool_metrics.record_error()
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=MeteredQueuePool,
+    pool_size=st.DB_POOL_SIZE,
+    max_overflow=st.DB_MAX_OVERFLOW,
+    pool_timeout=st.DB_POOL_TIMEOUT,
+    pool_recycle=st.DB_POOL_RECYCLE,
+    pool_pre_ping=st.DB_POOL_PRE_PING,
+)
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.connected(id(dbapi_connection))
+
+@event.listens_for(engine.sync_engine, "close")
+def _on_close(dbapi_connection, connection_record):
+    pool_metrics.closed(id(dbapi_connection))
+
+@event.listens_for(engine.sync_engine, "close_detached")
+def _on_close_detached(dbapi_connection):
+    pool_metrics.closed(id(dbapi_connection))
+
+def get_pool_status() -> dict:
+    """Текущее состояние пула соединений для мониторинга"""
+    pool = engine.sync_engine.pool
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": st.DB_MAX_OVERFLOW,
+        **pool_metrics.snapshot(),
+    }
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False - после commit объекты остаются доступными без ленивой подгрузки,
+# которая в асинхронной сессии невозможна
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
-def get_db():
-    if not st.DB_CREATED:
-        create_db()
-        st.DB_CREATED = True
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,8 +1,13 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from settings import get_settings
-from database import create_db
+from database import get_pool_status
+from middleware import BodySizeLimitMiddleware
+from bootstrap import bootstrap_db
+from services.auth_service import AuthService, token_cache, user_cache, user_cache_listener
+from services.image_service import shutdown_image_executor
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
 from routers import auth, plants, notes
@@ -11,12 +16,17 @@ settings = get_settings()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # При DB_CREATED=true считается, что bootstrap.py уже выполнен на этапе деплоя
     if not settings.DB_CREATED:
-        create_db()
-        settings.DB_CREATED = True
+        await asyncio.to_thread(bootstrap_db)
 
-    os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+    if settings.MEDIA_STORAGE == "local":
+        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+    # Сброс кеша пользователей по NOTIFY из других воркеров
+    user_cache_listener.start()
     yield
+    await user_cache_listener.stop()
+    shutdown_image_executor()
 
 app = FastAPI(
     title="Easy API",
@@ -24,6 +34,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(BodySizeLimitMiddleware, max_body_size=settings.MAX_REQUEST_BYTES)
+
 # routes
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(plants.router, prefix="/api/plants", tags=["plants"])
@@ -34,6 +46,20 @@ app.include_router(notes.router, prefix="/api/notes", tags=["notes"])
 async def root():
     return {"detail": "Hello World"}
 
+# Диагностика с внутренним состоянием сервера - только для администраторов
+auth_service = AuthService()
+
+@app.get("/api/health/db", dependencies=[Depends(auth_service.verify_admin)])
+async def db_pool_status():
+    return {"pool": get_pool_status()}
+
+@app.get("/api/health/auth", dependencies=[Depends(auth_service.verify_admin)])
+async def auth_cache_status():
+    return {
+        "token_cache": token_cache.stats(),
+        "user_cache": user_cache.stats()
+    }
+
 
 
 
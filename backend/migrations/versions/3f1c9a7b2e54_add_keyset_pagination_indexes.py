@@ -0,0 +1,28 @@
+"""add keyset pagination indexes
+
+Revision ID: 3f1c9a7b2e54
+Revises: d85993968e8e
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7b2e54'
+down_revision: Union[str, None] = 'd85993968e8e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_notes_user_id_created_at_id', 'notes', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_plants_user_id_created_at_id', 'plants', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_plants_user_id_created_at_id', table_name='plants')
+    op.drop_index('ix_notes_user_id_created_at_id', table_name='notes')
@@ -0,0 +1,28 @@
+"""add notes user_id/day and user_id/plant_id indexes
+
+Revision ID: a9d4e2c61f07
+Revises: 3f1c9a7b2e54
+Create Date: 2026-10-18 11:03:27.604915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e2c61f07'
+down_revision: Union[str, None] = '3f1c9a7b2e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_notes_user_id_day', 'notes', ['user_id', 'day'], unique=False)
+    op.create_index('ix_notes_user_id_plant_id', 'notes', ['user_id', 'plant_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notes_user_id_plant_id', table_name='notes')
+    op.drop_index('ix_notes_user_id_day', table_name='notes')
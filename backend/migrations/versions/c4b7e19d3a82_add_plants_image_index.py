@@ -0,0 +1,26 @@
+"""add plants image index
+
+Revision ID: c4b7e19d3a82
+Revises: a9d4e2c61f07
+Create Date: 2026-10-18 14:12:40.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4b7e19d3a82'
+down_revision: Union[str, None] = 'a9d4e2c61f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_plants_image', 'plants', ['image'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_plants_image', table_name='plants')
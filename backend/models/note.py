@@ -1,11 +1,24 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, select
+from sqlalchemy.orm import relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from database import Base
 from datetime import datetime, UTC
 import sqlalchemy as sa
 
+def _to_naive_utc(value: datetime):
+    # Колонки без часового пояса, asyncpg не принимает aware-datetime
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(UTC).replace(tzinfo=None)
+    return value
+
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        sa.Index("ix_notes_user_id_created_at_id", "user_id", "created_at", "id"),
+        sa.Index("ix_notes_user_id_day", "user_id", "day"),
+        sa.Index("ix_notes_user_id_plant_id", "user_id", "plant_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
@@ -16,44 +29,84 @@ class Note(Base):
     created_at = Column(DateTime, nullable=False, server_default=sa.func.now())
     updated_at = Column(DateTime, nullable=False, server_default=sa.func.now(), onupdate=sa.func.now())
 
-    user = relationship("User", back_populates="notes")
-    plant = relationship("Plant", back_populates="notes")
+    user = relationship("User", back_populates="notes", lazy="raise")
+    plant = relationship("Plant", back_populates="notes", lazy="raise")
 
     @classmethod
-    def create(cls, db: Session, title: str, text: str, user_id: int, plant_id: int = None, day: datetime = None):
-        db_note = cls(title=title, text=text, user_id=user_id, plant_id=plant_id, day=day)
+    async def create(cls, db: AsyncSession, title: str, text: str, user_id: int, plant_id: int = None, day: datetime = None):
+        db_note = cls(title=title, text=text, user_id=user_id, plant_id=plant_id, day=_to_naive_utc(day))
         db.add(db_note)
-        db.commit()
-        db.refresh(db_note)
+        await db.commit()
+        await db.refresh(db_note)
         return db_note
     
     @classmethod
-    def get_by_id(cls, db: Session, id: int):
-        return db.query(cls).filter(cls.id == id).first()
+    async def get_by_id(cls, db: AsyncSession, id: int):
+        result = await db.execute(select(cls).where(cls.id == id))
+        return result.scalars().first()
+    
+    @classmethod
+    async def get_all(cls, db: AsyncSession, user_id: int, plant_id: int = None):
+        query = select(cls).where(cls.user_id == user_id)
+        if plant_id:
+            query = query.where(cls.plant_id == plant_id)
+        result = await db.execute(query)
+        return result.scalars().all()
     
     @classmethod
-    def get_all(cls, db: Session, user_id: int, plant_id: int = None):
-        query = db.query(cls).filter(cls.user_id == user_id)
+    async def get_page(
+        cls, db: AsyncSession, user_id: int, limit: int, after: tuple = None,
+        plant_id: int = None, day_from: datetime = None, day_to: datetime = None
+    ):
+        """
+        Keyset-пагинация по (created_at, id) от новых к старым: возвращает не более limit заметок,
+        созданных раньше позиции after, и признак наличия следующей страницы
+        """
+        query = select(cls).where(cls.user_id == user_id)
         if plant_id:
-            query = query.filter(cls.plant_id == plant_id)
-        return query.all()
+            query = query.where(cls.plant_id == plant_id)
+        if day_from:
+            query = query.where(cls.day >= _to_naive_utc(day_from))
+        if day_to:
+            query = query.where(cls.day < _to_naive_utc(day_to))
+        if after:
+            query = query.where(sa.tuple_(cls.created_at, cls.id) < sa.tuple_(*after))
+        query = query.order_by(cls.created_at.desc(), cls.id.desc()).limit(limit + 1)
+        result = await db.execute(query)
+        notes = result.scalars().all()
+        return notes[:limit], len(notes) > limit
+    
+    @classmethod
+    async def get_calendar(cls, db: AsyncSession, user_id: int, day_from: datetime, day_to: datetime):
+        """Количество и id заметок по дням в интервале [day_from, day_to) одним проходом по индексу (user_id, day)"""
+        day = sa.cast(cls.day, sa.Date)
+        query = (
+            select(day, sa.func.count(cls.id), sa.func.array_agg(aggregate_order_by(cls.id, cls.id)))
+            .where(cls.user_id == user_id, cls.day >= _to_naive_utc(day_from), cls.day < _to_naive_utc(day_to))
+            .group_by(day)
+            .order_by(day)
+        )
+        result = await db.execute(query)
+        return result.all()
     
     @classmethod
-    def update(cls, db: Session, id: int, **kwargs):
-        db_note = db.query(cls).filter(cls.id == id).first()
+    async def update(cls, db: AsyncSession, id: int, **kwargs):
+        db_note = await cls.get_by_id(db, id)
         for key, value in kwargs.items():
             if key not in [attr.name for attr in cls.__table__.columns]:
                 continue
+            if key == "day":
+                value = _to_naive_utc(value)
             setattr(db_note, key, value)
-        db.commit()
-        db.refresh(db_note)
+        await db.commit()
+        await db.refresh(db_note)
         return db_note
     
     @classmethod
-    def delete(cls, db: Session, id: int):
-        db_note = db.query(cls).filter(cls.id == id).first()
-        db.delete(db_note)
-        db.commit()
+    async def delete(cls, db: AsyncSession, id: int):
+        db_note = await cls.get_by_id(db, id)
+        await db.delete(db_note)
+        await db.commit()
         return True
 
     def to_dict(self):
@@ -66,4 +119,4 @@ class Note(Base):
             "day": self.day,
             "created_at": self.created_at,
             "updated_at": self.updated_at
-        }
\ No newline at end of file
+        }
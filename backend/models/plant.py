@@ -1,11 +1,18 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, select
+from sqlalchemy.orm import relationship, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import Base
 import sqlalchemy as sa
+import hashlib
 from services.image_service import get_image_url
 
 class Plant(Base):
     __tablename__ = "plants"
+    __table_args__ = (
+        sa.Index("ix_plants_user_id_created_at_id", "user_id", "created_at", "id"),
+        sa.Index("ix_plants_image", "image"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -15,8 +22,9 @@ class Plant(Base):
     created_at = Column(DateTime, nullable=False, server_default=sa.func.now())
     updated_at = Column(DateTime, nullable=False, server_default=sa.func.now(), onupdate=sa.func.now())
 
-    user = relationship("User", back_populates="plants")
-    notes = relationship("Note", back_populates="plant", cascade="all, delete-orphan")
+    # lazy="raise": связи загружаются только явно через dict_options(), без скрытых запросов
+    user = relationship("User", back_populates="plants", lazy="raise")
+    notes = relationship("Note", back_populates="plant", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
 
     def to_dict(self, full: bool = False):
         return {
@@ -31,40 +39,83 @@ class Plant(Base):
         }
 
     @classmethod
-    def create(cls, db: Session, name: str, user_id: int, description: str = "", image: str = ""):
+    def dict_options(cls):
+        """Опции загрузки для to_dict(): заметки всех растений одним запросом"""
+        return (selectinload(cls.notes),)
+
+    @classmethod
+    async def _refresh(cls, db: AsyncSession, db_plant):
+        # Обновляем только колонки, уже загруженные связи остаются на месте
+        await db.refresh(db_plant, attribute_names=[column.key for column in cls.__table__.columns])
+
+    @classmethod
+    async def create(cls, db: AsyncSession, name: str, user_id: int, description: str = "", image: str = ""):
         db_plant = cls(name=name, description=description, image=image, user_id=user_id)
         db.add(db_plant)
-        db.commit()
-        db.refresh(db_plant)
+        await db.commit()
+        await cls._refresh(db, db_plant)
+        set_committed_value(db_plant, "notes", [])
         return db_plant
     
     @classmethod
-    def get_by_id(cls, db: Session, id: int):
-        return db.query(cls).filter(cls.id == id).first()
+    async def get_by_id(cls, db: AsyncSession, id: int, options: tuple = ()):
+        result = await db.execute(select(cls).where(cls.id == id).options(*options))
+        return result.scalars().first()
     
     @classmethod
-    def get_all(cls, db: Session):
-        return db.query(cls).all()
+    async def get_all(cls, db: AsyncSession, options: tuple = ()):
+        result = await db.execute(select(cls).options(*options))
+        return result.scalars().all()
     
     @classmethod
-    def get_all_by_user_id(cls, db: Session, user_id: int):
-        return db.query(cls).filter(cls.user_id == user_id).all()
+    async def get_all_by_user_id(cls, db: AsyncSession, user_id: int, options: tuple = ()):
+        result = await db.execute(select(cls).where(cls.user_id == user_id).options(*options))
+        return result.scalars().all()
     
     @classmethod
-    def update(cls, db: Session, id: int, **kwargs):
-        db_plant = db.query(cls).filter(cls.id == id).first()
+    async def get_page_by_user_id(cls, db: AsyncSession, user_id: int, limit: int, after: tuple = None, options: tuple = ()):
+        """
+        Keyset-пагинация по (created_at, id): возвращает не более limit растений после позиции after
+        и признак наличия следующей страницы
+        """
+        query = select(cls).where(cls.user_id == user_id)
+        if after:
+            query = query.where(sa.tuple_(cls.created_at, cls.id) > sa.tuple_(*after))
+        query = query.order_by(cls.created_at, cls.id).limit(limit + 1).options(*options)
+        result = await db.execute(query)
+        plants = result.scalars().all()
+        return plants[:limit], len(plants) > limit
+    
+    @classmethod
+    async def update(cls, db: AsyncSession, id: int, options: tuple = (), **kwargs):
+        db_plant = await cls.get_by_id(db, id, options)
         for key, value in kwargs.items():
             if key not in [attr.name for attr in cls.__table__.columns]:
                 continue
             setattr(db_plant, key, value)
-        db.commit()
-        db.refresh(db_plant)
+        await db.commit()
+        await cls._refresh(db, db_plant)
         return db_plant
     
     @classmethod
-    def delete(cls, db: Session, id: int):
-        db_plant = db.query(cls).filter(cls.id == id).first()
-        db.delete(db_plant)
-        db.commit()
+    async def delete(cls, db: AsyncSession, id: int):
+        db_plant = await cls.get_by_id(db, id)
+        await db.delete(db_plant)
+        await db.commit()
         return True
 
+    @classmethod
+    async def lock_image(cls, db: AsyncSession, image: str):
+        """
+        Блокирует изображение до конца текущей транзакции (advisory lock Postgres).
+        Одинаковые загрузки хранятся один раз, поэтому сохранение изображения вместе с созданием
+        растения и проверка ссылок вместе с удалением файлов выполняются под этой блокировкой
+        """
+        lock_id = int(hashlib.sha256(image.encode()).hexdigest()[:15], 16)
+        await db.execute(select(sa.func.pg_advisory_xact_lock(lock_id)))
+
+    @classmethod
+    async def is_image_used(cls, db: AsyncSession, image: str):
+        """Есть ли растения, ссылающиеся на изображение (одинаковые загрузки хранятся один раз)"""
+        result = await db.execute(select(sa.exists().where(cls.image == image)))
+        return result.scalar()
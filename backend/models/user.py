@@ -1,11 +1,18 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ARRAY
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ARRAY, select
+from sqlalchemy.orm import relationship, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import Base
 from datetime import datetime, UTC
 from models.plant import Plant
 from models.note import Note
+import sqlalchemy as sa
 import bcrypt
 
+def _utcnow():
+    # Колонки без часового пояса, asyncpg не принимает aware-datetime
+    return datetime.now(UTC).replace(tzinfo=None)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -15,27 +22,50 @@ class User(Base):
     name = Column(String)
     role = Column(String, default="user")
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.now(UTC))
-    updated_at = Column(DateTime, default=datetime.now(UTC), onupdate=datetime.now(UTC))
+    created_at = Column(DateTime, default=lambda: _utcnow())
+    updated_at = Column(DateTime, default=lambda: _utcnow(), onupdate=lambda: _utcnow())
+
+    # lazy="raise": связи загружаются только явно через dict_options(), без скрытых запросов
+    plants = relationship("Plant", back_populates="user", lazy="raise")
+    notes = relationship("Note", back_populates="user", lazy="raise")
 
-    plants = relationship("Plant", back_populates="user")
-    notes = relationship("Note", back_populates="user")
+    @classmethod
+    def dict_options(cls, full: bool = False):
+        """Опции загрузки для to_dict(full): фиксированное число запросов независимо от числа строк"""
+        plants = selectinload(cls.plants)
+        if full:
+            plants = plants.selectinload(Plant.notes)
+        return (plants, selectinload(cls.notes))
+
+    @classmethod
+    async def _refresh(cls, db: AsyncSession, db_user):
+        # Обновляем только колонки, уже загруженные связи остаются на месте
+        await db.refresh(db_user, attribute_names=[column.key for column in cls.__table__.columns])
 
     @classmethod
-    def create(cls, db: Session, email: str, password: str, name: str):
+    async def create(cls, db: AsyncSession, email: str, password: str, name: str):
         db_user = cls(email=email, password=cls._hash_password(password), name=name)
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await cls._refresh(db, db_user)
+        set_committed_value(db_user, "plants", [])
+        set_committed_value(db_user, "notes", [])
         return db_user
     
     @classmethod
-    def get_by_email(cls, db: Session, email: str):
-        return db.query(cls).filter(cls.email == email).first()
+    async def get_by_email(cls, db: AsyncSession, email: str, options: tuple = ()):
+        result = await db.execute(select(cls).where(cls.email == email).options(*options))
+        return result.scalars().first()
     
     @classmethod
-    def get_by_id(cls, db: Session, id: int):
-        return db.query(cls).filter(cls.id == id).first()
+    async def get_by_id(cls, db: AsyncSession, id: int, options: tuple = ()):
+        result = await db.execute(select(cls).where(cls.id == id).options(*options))
+        return result.scalars().first()
+    
+    @classmethod
+    async def get_all(cls, db: AsyncSession, options: tuple = ()):
+        result = await db.execute(select(cls).options(*options))
+        return result.scalars().all()
     
     @staticmethod
     def _hash_password(password: str):
@@ -46,16 +76,25 @@ class User(Base):
         return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
     
     @classmethod
-    def update(cls, db: Session, id: int, **kwargs):
-        db_user = db.query(cls).filter(cls.id == id).first()
+    async def update(cls, db: AsyncSession, id: int, options: tuple = (), **kwargs):
+        db_user = await cls.get_by_id(db, id, options)
+        if db_user is None:
+            return None
         for key, value in kwargs.items():
             if key not in [attr.name for attr in cls.__table__.columns]:
                 continue
             setattr(db_user, key, value)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await cls._refresh(db, db_user)
         return db_user
 
+    @classmethod
+    async def delete(cls, db: AsyncSession, id: int):
+        # Растения и заметки удаляются каскадом на стороне БД (ondelete="CASCADE")
+        await db.execute(sa.delete(cls).where(cls.id == id))
+        await db.commit()
+        return True
+
     def to_dict(self, full: bool = False):
         return {
             "id": self.id,
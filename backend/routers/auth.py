@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Form
 from database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from settings import get_settings
 
-from services.auth_service import AuthService
+from services.auth_service import AuthService, AuthUser
 from services.user_service import UserCreate
 
 from models.user import User    
@@ -17,14 +17,14 @@ async def register(
     email: str = Form(...),
     password: str = Form(...),
     name: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     user = UserCreate(email=email, password=password, name=name)
 
-    if User.get_by_email(db, user.email):
+    if await User.get_by_email(db, user.email):
         raise HTTPException(status_code=406, detail="User already exists")
     
-    user = User.create(db, user.email, user.password, user.name)
+    user = await User.create(db, user.email, user.password, user.name)
     token = auth_service.create_token({"sub": str(user.id)})
     
     return {
@@ -37,13 +37,14 @@ async def register(
 async def login(
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = User.get_by_email(db, email)
+    user = await User.get_by_email(db, email, User.dict_options(True))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
-        User.update(db, user.id, is_active=True)
+        await User.update(db, user.id, is_active=True)
+        await auth_service.invalidate_user(db, user.id)
     
     if not User._check_password(password, user.password):
         raise HTTPException(status_code=403, detail="Invalid password")
@@ -56,19 +57,27 @@ async def login(
 
 @router.get("/me", status_code=status.HTTP_200_OK)
 async def me(
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
+    user = await User.get_by_id(db, user.id, User.dict_options())
+    if not user:
+        # Пользователь удален после проверки токена
+        raise HTTPException(status_code=401, detail="User not found")
     return {
         "user": user.to_dict()
     }
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
 async def logout(
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    User.update(db, user.id, is_active=False)
+    user_id = user.id
+    user = await User.update(db, user_id, User.dict_options(), is_active=False)
+    await auth_service.invalidate_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
     return {
         "user": user.to_dict(),
         "detail": "Logged out"
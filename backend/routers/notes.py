@@ -1,11 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Form
+from fastapi import APIRouter, HTTPException, Depends, status, Form, Query
 from database import get_db
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, date, time, timedelta
 from settings import get_settings
 
-from services.auth_service import AuthService
-from services.note_service import NoteCreate
+from services.auth_service import AuthService, AuthUser
+from services.note_service import NoteCreate, validate_plant_id
+from services.pagination_service import encode_cursor, decode_cursor
 
 from models.user import User
 from models.note import Note
@@ -20,34 +21,67 @@ async def create_note(
     text: str = Form(...),
     plant_id: int = Form(None),
     day: datetime = Form(None),
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not any([plant_id, day]):
         raise HTTPException(status_code=400, detail="plant_id OR day is required")
+    if plant_id and not await validate_plant_id(db, plant_id):
+        raise HTTPException(status_code=406, detail="Invalid title, text, user_id, plant_id, or day")
     note = NoteCreate(title=title, text=text, user_id=user.id, plant_id=plant_id, day=day)
-    note = Note.create(db, note.title, note.text, note.user_id, note.plant_id, note.day)
+    note = await Note.create(db, note.title, note.text, note.user_id, note.plant_id, note.day)
     return {
         "note": note.to_dict()
     }
 
 @router.get("/get", status_code=status.HTTP_200_OK)
 async def get_notes(
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    plant_id: int = Query(None),
+    day_from: datetime = Query(None),
+    day_to: datetime = Query(None),
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    notes = Note.get_all(db, user.id)
+    after = decode_cursor(cursor) if cursor else None
+    notes, has_more = await Note.get_page(db, user.id, limit, after, plant_id, day_from, day_to)
     return {
-        "notes": [note.to_dict() for note in notes]
+        "notes": [note.to_dict() for note in notes],
+        "next_cursor": encode_cursor(notes[-1].created_at, notes[-1].id) if has_more else None
+    }
+
+@router.get("/calendar", status_code=status.HTTP_200_OK)
+async def get_calendar(
+    day_from: date = Query(..., alias="from"),
+    day_to: date = Query(..., alias="to"),
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if day_to < day_from:
+        raise HTTPException(status_code=400, detail="'to' must not be earlier than 'from'")
+    if (day_to - day_from).days + 1 > settings.CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {settings.CALENDAR_MAX_DAYS} days")
+    # Границы включительно: [from 00:00, to + 1 день 00:00)
+    rows = await Note.get_calendar(
+        db, user.id,
+        datetime.combine(day_from, time.min),
+        datetime.combine(day_to + timedelta(days=1), time.min)
+    )
+    return {
+        "days": [
+            {"day": day, "count": count, "note_ids": note_ids}
+            for day, count, note_ids in rows
+        ]
     }
 
 @router.get("/get/{note_id}", status_code=status.HTTP_200_OK)
 async def get_note(
     note_id: int,
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    note = Note.get_by_id(db, note_id)
+    note = await Note.get_by_id(db, note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     return {
@@ -61,16 +95,18 @@ async def update_note(
     text: str = Form(None),
     plant_id: int = Form(None),
     day: datetime = Form(None),
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not any([title, text, plant_id, day]):
         raise HTTPException(status_code=400, detail="No fields to update")
-    note = Note.get_by_id(db, note_id)
+    note = await Note.get_by_id(db, note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     if note.user_id != user.id:
         raise HTTPException(status_code=403, detail="You are not allowed to update this note")
+    if plant_id and not await validate_plant_id(db, plant_id):
+        raise HTTPException(status_code=406, detail="Invalid title, text, user_id, plant_id, or day")
     note = NoteCreate(
         title=title if title else note.title,
         text=text if text else note.text,
@@ -78,7 +114,7 @@ async def update_note(
         plant_id=plant_id if plant_id else note.plant_id,
         day=day if day else note.day
     )
-    note = Note.update(db, note_id, **note.__dict__)
+    note = await Note.update(db, note_id, **note.__dict__)
     return {
         "note": note.to_dict()
     }
@@ -86,15 +122,15 @@ async def update_note(
 @router.delete("/delete/{note_id}", status_code=status.HTTP_200_OK)
 async def delete_note(
     note_id: int,
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    note = Note.get_by_id(db, note_id)
+    note = await Note.get_by_id(db, note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     if note.user_id != user.id:
         raise HTTPException(status_code=403, detail="You are not allowed to delete this note")
-    Note.delete(db, note_id)
+    await Note.delete(db, note_id)
     return {
         "note": note.to_dict(),
         "detail": "Note deleted"
@@ -1,13 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Form, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, status, Form, File, UploadFile, Query, Response, Request
 from database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from settings import get_settings
 from fastapi.responses import JSONResponse, FileResponse
-from services.image_service import save_upload_image, delete_plant_image, get_plant_image, get_image_path
+from services.image_service import save_upload_image, upload_content_key, delete_plant_image, get_plant_image, image_version
 
-from services.auth_service import AuthService
+from services.auth_service import AuthService, AuthUser
 from services.plant_service import PlantCreate
+from services.pagination_service import encode_cursor, decode_cursor
 
 from models.user import User
 from models.plant import Plant
@@ -16,24 +17,36 @@ settings = get_settings()
 router = APIRouter()
 auth_service = AuthService()
 
+async def release_plant_image(db: AsyncSession, image: str):
+    """Удаляет файлы изображения, если на него больше не ссылается ни одно растение"""
+    await Plant.lock_image(db, image)
+    try:
+        if not await Plant.is_image_used(db, image):
+            await delete_plant_image(image)
+    finally:
+        # Коммит снимает блокировку изображения
+        await db.commit()
+
 @router.get("/{plant_id}/image")
 async def get_plant_image_endpoint(
+    request: Request,
     plant_id: int,
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    size: int = Query(None, ge=1),
+    w: int = Query(None, ge=1),
+    v: str = Query(None),
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    plant = Plant.get_by_id(db, plant_id)
+    plant = await Plant.get_by_id(db, plant_id)
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
     
     if plant.user_id != user.id:
         raise HTTPException(status_code=403, detail="You are not allowed to access this image")
     
-    file_path = get_image_path(plant.image)
-    if not file_path:
-        raise HTTPException(status_code=404, detail="Image not found")
-    
-    return await get_plant_image(file_path)
+    # Надолго кешируем только ответ по актуальной версии URL из get_image_url
+    versioned = v is not None and v == image_version(plant.image)
+    return await get_plant_image(plant.image, size or w, request.headers, versioned)
 
 
 @router.post("/create", status_code=status.HTTP_201_CREATED)
@@ -41,16 +54,27 @@ async def create_plant(
     name: str = Form(...),  
     description: str = Form(None),
     image: UploadFile = File(None),
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
     plant = PlantCreate(name=name, user_id=user.id, description=description)
-    plant = Plant.create(db, plant.name, plant.user_id, plant.description)
 
+    # Ключ изображения - хеш содержимого, поэтому оно сохраняется до создания растения.
+    # Ключ заблокирован до коммита создания: параллельное удаление растения с тем же изображением
+    # не удалит файлы, которые пропустила запись как уже существующие
+    image_key = ""
     if image:
-        image_path = await save_upload_image(image, plant.id)
-        if image_path:
-            plant = Plant.update(db, plant.id, image=image_path)
+        image_key = await upload_content_key(image)
+        await Plant.lock_image(db, image_key)
+        image_key = await save_upload_image(image, image_key)
+    try:
+        plant = await Plant.create(db, plant.name, plant.user_id, plant.description, image_key)
+    except Exception:
+        await db.rollback()
+        # Растение не создано - файлы изображения не должны остаться без ссылок
+        if image_key:
+            await release_plant_image(db, image_key)
+        raise
     
     return {
         "plant": plant.to_dict(True)
@@ -59,16 +83,17 @@ async def create_plant(
 @router.delete("/delete/{plant_id}", status_code=status.HTTP_200_OK)
 async def delete_plant(
     plant_id: int,
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    plant = Plant.get_by_id(db, plant_id)
+    plant = await Plant.get_by_id(db, plant_id, Plant.dict_options())
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
     if plant.user_id != user.id:
         raise HTTPException(status_code=403, detail="You are not allowed to delete this plant")
-    Plant.delete(db, plant_id)
-    delete_plant_image(plant.image)
+    await Plant.delete(db, plant_id)
+    if plant.image:
+        await release_plant_image(db, plant.image)
     return {
         "plant": plant.to_dict(True),
         "detail": "Plant deleted"
@@ -76,24 +101,31 @@ async def delete_plant(
 
 @router.get("/get", status_code=status.HTTP_200_OK)
 async def get_plants(
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    plants = Plant.get_all_by_user_id(db, user.id)
-    if not plants:
+    after = decode_cursor(cursor) if cursor else None
+    plants, has_more = await Plant.get_page_by_user_id(db, user.id, limit, after, Plant.dict_options())
+    if not plants and not after:
         raise HTTPException(status_code=404, detail="No plants found")
-    response = []
+    # Тело ответа остается списком для совместимости с клиентами, курсор следующей страницы - в заголовке
+    if has_more:
+        response.headers["X-Next-Cursor"] = encode_cursor(plants[-1].created_at, plants[-1].id)
+    result = []
     for plant in plants:
-        response.append(plant.to_dict(True))
-    return response
+        result.append(plant.to_dict(True))
+    return result
 
 @router.get("/get/{plant_id}", status_code=status.HTTP_200_OK)
 async def get_plant(
     plant_id: int,
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    plant = Plant.get_by_id(db, plant_id)
+    plant = await Plant.get_by_id(db, plant_id, Plant.dict_options())
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
     return {
@@ -105,19 +137,39 @@ async def update_plant(
     plant_id: int,
     name: str = Form(...),
     description: str = Form(...),
-    image: str = Form(...),
-    user: User = Depends(auth_service.verify_user),
-    db: Session = Depends(get_db)
+    image: UploadFile = File(None),
+    user: AuthUser = Depends(auth_service.verify_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    plant = Plant.get_by_id(db, plant_id)
+    plant = await Plant.get_by_id(db, plant_id)
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
     if plant.user_id != user.id:
         raise HTTPException(status_code=403, detail="You are not allowed to update this plant")
-    plant = PlantCreate(name=name, user_id=user.id, description=description, image=image)
-    plant = Plant.update(db, plant_id, **plant.__dict__)
+    old_image = plant.image
+    fields = PlantCreate(name=name, user_id=user.id, description=description)
+    values = {"name": fields.name, "description": fields.description}
+
+    # Новое изображение сохраняется так же, как при создании растения: под блокировкой ключа до коммита
+    image_key = ""
+    if image:
+        image_key = await upload_content_key(image)
+        await Plant.lock_image(db, image_key)
+        image_key = await save_upload_image(image, image_key)
+        if not image_key:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Invalid image")
+        values["image"] = image_key
+    try:
+        plant = await Plant.update(db, plant_id, Plant.dict_options(), **values)
+    except Exception:
+        await db.rollback()
+        if image_key:
+            await release_plant_image(db, image_key)
+        raise
+    # Прежнее изображение удаляется, если на него больше не ссылается ни одно растение
+    if image_key and old_image and old_image != image_key:
+        await release_plant_image(db, old_image)
     return {
         "plant": plant.to_dict(True)
     }
-
-
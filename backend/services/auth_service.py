@@ -2,16 +2,112 @@ from datetime import datetime, timedelta, UTC
 from jose import jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
+import hashlib
 import os
+import asyncpg
+import sqlalchemy as sa
 from settings import get_settings
 from database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.user import User
+from services.cache_service import TTLCache
 
 settings = get_settings()
 security = HTTPBearer()
 
+# Общие для всех экземпляров AuthService кеши:
+# sha256(token) -> payload (до exp токена) и user_id -> (is_active, role)
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_EXPIRE_MINUTES * 60)
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+# Канал Postgres NOTIFY: id пользователя, чье состояние изменилось (вход/выход, смена роли)
+USER_INVALIDATION_CHANNEL = "user_cache_invalidate"
+
+# Поколения user_cache: сброс записи пользователя увеличивает его поколение, очистка кеша - эпоху.
+# Промах кеша сохраняет прочитанное из БД, только если поколение не изменилось за время запроса,
+# иначе сброс, пришедший во время запроса, был бы перезаписан устаревшим состоянием
+_user_generations: dict = {}
+_cache_epoch = 0
+
+def _user_cache_generation(user_id: int) -> tuple:
+    return _cache_epoch, _user_generations.get(user_id, 0)
+
+def _invalidate_cached_user(user_id: int):
+    _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+    user_cache.invalidate(user_id)
+
+def _clear_user_cache():
+    global _cache_epoch
+    _cache_epoch += 1
+    # Новая эпоха отличает все прежние поколения, поэтому счетчики пользователей можно сбросить
+    _user_generations.clear()
+    user_cache.clear()
+
+class UserCacheListener:
+    """
+    Держит отдельное соединение с LISTEN на USER_INVALIDATION_CHANNEL и сбрасывает user_cache,
+    когда любой воркер меняет состояние пользователя, - выход действует сразу во всех процессах.
+    Пока соединения нет, уведомления могут теряться, поэтому кеш не используется
+    и при каждом (пере)подключении очищается
+    """
+    def __init__(self):
+        self.connected = False
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        _invalidate_cached_user(int(payload))
+
+    async def _run(self):
+        while True:
+            try:
+                conn = await asyncpg.connect(
+                    host=settings.POSTGRES_HOST, port=int(settings.POSTGRES_PORT), user=settings.POSTGRES_USER,
+                    password=settings.POSTGRES_PASSWORD, database=settings.POSTGRES_DB
+                )
+            except Exception as e:
+                print(f"User cache listener: connection failed: {e}")
+                await asyncio.sleep(5)
+                continue
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda _: lost.set())
+            try:
+                await conn.add_listener(USER_INVALIDATION_CHANNEL, self._on_notify)
+                _clear_user_cache()
+                self.connected = True
+                await lost.wait()
+            except Exception as e:
+                print(f"User cache listener: {e}")
+            finally:
+                self.connected = False
+                _clear_user_cache()
+                if not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(1)
+
+user_cache_listener = UserCacheListener()
+
+class AuthUser:
+    """Текущий пользователь, восстановленный из токена и кеша без обращения к БД"""
+    def __init__(self, id: int, role: str, is_active: bool):
+        self.id = id
+        self.role = role
+        self.is_active = is_active
+
 class AuthService:
     def __init__(self):
         self.secret_key = settings.SECRET_KEY
@@ -33,6 +129,15 @@ class AuthService:
         )
     
     def verify_token(self, token: str):
+        key = hashlib.sha256(token.encode()).digest()
+        payload = token_cache.get(key)
+        if payload is not None:
+            return payload
+        payload = self._decode_token(token)
+        token_cache.set(key, payload, expires_at=payload["exp"])
+        return payload
+
+    def _decode_token(self, token: str):
         try:
             payload = jwt.decode(
                 token,
@@ -51,18 +156,46 @@ class AuthService:
             print(e)
             raise HTTPException(status_code=403, detail="Error while decoding token")
     
-    def verify_user(
+    async def verify_user(
         self, HTTPAuthorizationCredentials: HTTPAuthorizationCredentials = Depends(security),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
     ):
         token = HTTPAuthorizationCredentials.credentials
         payload = self.verify_token(token)
         user_id = int(payload.get("sub"))
-        user = User.get_by_id(db, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        if not user.is_active:
+        # Без подписки на сброс кеш мог пропустить выход в другом воркере - читаем из БД
+        cached = user_cache.get(user_id) if user_cache_listener.connected else None
+        if cached is None:
+            generation = _user_cache_generation(user_id)
+            user = await User.get_by_id(db, user_id)
+            if not user:
+                # Пользователь удален - токен больше недействителен
+                raise HTTPException(status_code=401, detail="User not found")
+            cached = (user.is_active, user.role)
+            if user_cache_listener.connected and _user_cache_generation(user_id) == generation:
+                user_cache.set(user_id, cached)
+        is_active, role = cached
+        if not is_active:
             raise HTTPException(status_code=403, detail="User logged out")
+        return AuthUser(user_id, role, is_active)
+
+    async def verify_admin(
+        self, HTTPAuthorizationCredentials: HTTPAuthorizationCredentials = Depends(security),
+        db: AsyncSession = Depends(get_db)
+    ):
+        """verify_user, доступный только администраторам (role == "admin")"""
+        user = await self.verify_user(HTTPAuthorizationCredentials, db)
+        if user.role != "admin":
+            raise HTTPException(status_code=403, detail="Admin role required")
         return user
 
+    async def invalidate_user(self, db: AsyncSession, user_id: int):
+        """
+        Сбрасывает закешированное состояние пользователя (вход/выход, смена роли) в этом процессе
+        и, через NOTIFY при коммите, во всех остальных воркерах
+        """
+        _invalidate_cached_user(user_id)
+        await db.execute(sa.select(sa.func.pg_notify(USER_INVALIDATION_CHANNEL, str(user_id))))
+        await db.commit()
+
 
@@ -1,80 +1,395 @@
 import os
-from PIL import Image
+import asyncio
+import hashlib
+import json
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from PIL import Image, features
 from io import BytesIO
 from settings import get_settings
+from services.storage_service import create_media_store, is_content_key, IMMUTABLE_CACHE_CONTROL
+from services.cache_service import TTLCache
 from fastapi import UploadFile, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from email.utils import formatdate, parsedate_to_datetime
 from typing import Optional
 
 settings = get_settings()
 
-def get_image_url(plant_id: int, filename: str) -> str:
-    """Возвращает безопасный URL изображения для фронтенда"""
-    if not filename:
+# формат -> (формат Pillow, расширение, MIME-тип, параметры сохранения)
+IMAGE_FORMATS = {
+    "jpeg": ("JPEG", ".jpg", "image/jpeg", {"quality": 85, "optimize": True}),
+    "webp": ("WEBP", ".webp", "image/webp", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", ".avif", "image/avif", {"quality": 60}),
+}
+
+def _format_supported(fmt: str) -> bool:
+    try:
+        return fmt in IMAGE_FORMATS and features.check(fmt)
+    except ValueError:
+        return False
+
+# JPEG сохраняется всегда как запасной вариант для клиентов без поддержки новых форматов
+ENABLED_FORMATS = ["jpeg"] + [fmt for fmt in settings.IMAGE_EXTRA_FORMATS if fmt != "jpeg" and _format_supported(fmt)]
+
+media_store = create_media_store(settings)
+
+# Манифест изображения - размеры вариантов в байтах {ширина: {формат: размер}}; пишется последним,
+# поэтому его наличие означает, что записаны все копии
+MANIFEST_NAME = "manifest.json"
+# Содержимое по хешу неизменно, как и его манифест, поэтому манифесты кешируются в памяти процесса
+_manifests = TTLCache(settings.IMAGE_MANIFEST_CACHE_SIZE, 24 * 3600)
+
+_executor: Optional[Executor] = None
+_in_flight = 0
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if settings.IMAGE_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="image")
+    return _executor
+
+def shutdown_image_executor():
+    """Останавливает пул обработки изображений (при завершении приложения)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+async def run_image_job(func, *args):
+    """
+    Выполняет func(*args) в пуле обработки изображений.
+    Если очередь заполнена, сразу отвечает 429, не блокируя event loop
+    """
+    global _in_flight
+    if _in_flight >= settings.IMAGE_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=429,
+            detail="Image processing queue is full, try again later",
+            headers={"Retry-After": "1"}
+        )
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), partial(func, *args))
+    finally:
+        _in_flight -= 1
+
+def image_version(image: str) -> Optional[str]:
+    """Версия изображения для URL - префикс хеша содержимого; у файлов старого формата версии нет"""
+    return image[:16] if is_content_key(image) else None
+
+def get_image_url(plant_id: int, image: str) -> str:
+    """
+    Возвращает безопасный URL изображения для фронтенда.
+    Версия меняется вместе с содержимым, поэтому ответ по такому URL можно кешировать надолго
+    """
+    if not image:
         return ""
-    return f"/api/plants/{plant_id}/image"
+    version = image_version(image)
+    if version is None:
+        return f"/api/plants/{plant_id}/image"
+    return f"/api/plants/{plant_id}/image?v={version}"
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+def _not_modified_since(if_modified_since: str, mtime: float) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since.timestamp()
+
+def _accepted_formats(accept: str) -> list:
+    """Форматы, которые клиент явно перечислил в Accept (q > 0); JPEG допустим всегда"""
+    accepted = ["jpeg"]
+    for item in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = next((param[2:] for param in params if param.startswith("q=")), "1")
+        try:
+            if float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        for fmt, (_, _, mime, _) in IMAGE_FORMATS.items():
+            if media_type == mime and fmt not in accepted:
+                accepted.append(fmt)
+    return accepted
+
+def _rendition_size(size: int = None) -> int:
+    """Наименьший сохраняемый размер не меньше size (или самый большой)"""
+    if not size:
+        return settings.IMAGE_RENDITIONS[-1]
+    return next((width for width in settings.IMAGE_RENDITIONS if width >= size), settings.IMAGE_RENDITIONS[-1])
+
+def _legacy_path(filename: str) -> Optional[str]:
+    """
+    Путь к файлу изображения старого формата в MEDIA_ROOT. Из значения берется только имя файла;
+    None, если путь все равно выходит за MEDIA_ROOT (например, через симлинк)
+    """
+    name = os.path.basename(filename or "")
+    if not name or name in (".", ".."):
+        return None
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    path = os.path.join(root, name)
+    if os.path.commonpath([root, os.path.realpath(path)]) != root:
+        return None
+    return path
+
+def object_name(size: int, fmt: str) -> str:
+    return f"{size}{IMAGE_FORMATS[fmt][1]}"
+
+# Для изображений без манифеста во внешнем хранилище: от обычно самого легкого формата к самому тяжелому
+_FORMAT_PREFERENCE = ("avif", "webp", "jpeg")
+
+def _read_manifest(image: str) -> Optional[dict]:
+    """Манифест изображения (из кеша или хранилища); None - изображение загружено до появления манифестов"""
+    manifest = _manifests.get(image)
+    if manifest is None:
+        data = media_store.read(image, MANIFEST_NAME)
+        if data is None:
+            return None
+        manifest = {int(width): sizes for width, sizes in json.loads(data).items()}
+        _manifests.set(image, manifest)
+    return manifest
+
+def _smallest_format(sizes: dict, accepted: list) -> Optional[str]:
+    """Самый легкий из форматов, которые принимает клиент (sizes - {формат: размер})"""
+    candidates = [fmt for fmt in accepted if fmt in sizes]
+    return min(candidates, key=sizes.get) if candidates else None
+
+def _negotiate_variant(image: str, size: int, accept: str):
+    """
+    Выбирает самый легкий вариант изображения (путь, формат, stat, ETag), который поддерживает клиент.
+    Размеры вариантов берутся из манифеста, поэтому обычно нужен единственный stat выбранного файла,
+    результат которого переиспользует FileResponse
+    """
+    accepted = _accepted_formats(accept)
+    if not is_content_key(image):
+        # Изображения старого формата лежат плоско в MEDIA_ROOT только в JPEG основного размера
+        path = _legacy_path(image)
+        if path is None:
+            return None
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return path, "jpeg", stat_result, f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}-jpeg"'
 
-async def get_plant_image(file_path: str) -> FileResponse:
-    """Возвращает изображение как FileResponse"""
-    if not file_path or not os.path.exists(file_path):
+    manifest = _read_manifest(image)
+    rendition = _rendition_size(size)
+    for width in dict.fromkeys((rendition, settings.IMAGE_RENDITIONS[-1])):
+        if manifest is not None:
+            sizes = manifest.get(width, {})
+        else:
+            # Изображение загружено до появления манифестов - размеры вариантов узнаются из stat
+            stats = {fmt: media_store.stat(image, object_name(width, fmt)) for fmt in accepted}
+            sizes = {fmt: stat_result.st_size for fmt, stat_result in stats.items() if stat_result is not None}
+        fmt = _smallest_format(sizes, accepted)
+        if fmt is None:
+            continue
+        stat_result = media_store.stat(image, object_name(width, fmt))
+        if stat_result is None:
+            continue
+        # Содержимое по хешу неизменно, поэтому ETag не зависит от времени записи файла
+        return media_store.path(image, object_name(width, fmt)), fmt, stat_result, f'"{image[:16]}-{width}-{fmt}"'
+    return None
+
+def _redirect_to_variant(image: str, size: int, accept: str) -> Response:
+    """
+    Перенаправляет клиента на presigned URL самого легкого варианта изображения во внешнем хранилище.
+    Наличие объекта не проверяется: все размеры пишутся в каждом из ENABLED_FORMATS при загрузке
+    """
+    accepted = _accepted_formats(accept)
+    width = _rendition_size(size)
+    manifest = _read_manifest(image)
+    fmt = _smallest_format(manifest.get(width, {}), accepted) if manifest is not None else None
+    if fmt is None:
+        fmt = next(fmt for fmt in _FORMAT_PREFERENCE if fmt in accepted and fmt in ENABLED_FORMATS)
+    url = media_store.presigned_url(image, object_name(width, fmt))
+    return RedirectResponse(url, status_code=307, headers={
+        # Перенаправление кешируется не дольше, чем действительна ссылка
+        "Cache-Control": f"private, max-age={settings.S3_PRESIGN_TTL_SECONDS // 2}",
+        "Vary": "Accept",
+    })
+
+async def get_plant_image(image: str, size: int = None, request_headers: dict = None, versioned: bool = False) -> Response:
+    """
+    Возвращает изображение как FileResponse с ETag/Last-Modified/Cache-Control
+    или 304, если у клиента актуальная копия. Размер и формат выбираются по size и заголовку Accept.
+    Из внешнего хранилища (S3) изображение отдается перенаправлением на presigned URL
+    """
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    request_headers = request_headers or {}
+    if media_store.redirects and is_content_key(image):
+        return _redirect_to_variant(image, size, request_headers.get("accept"))
+    variant = _negotiate_variant(image, size, request_headers.get("accept"))
+    if variant is None:
         raise HTTPException(status_code=404, detail="Image not found")
-    
+    file_path, fmt, stat_result, etag = variant
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        # Версионированный URL неизменен - кешируем надолго; без версии клиент перепроверяет по ETag
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if versioned else "private, no-cache",
+        "Vary": "Accept",
+    }
+
+    if_none_match = request_headers.get("if-none-match")
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        not_modified = if_modified_since is not None and _not_modified_since(if_modified_since, stat_result.st_mtime)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
     return FileResponse(
         file_path,
-        media_type="image/jpeg",
-        filename=os.path.basename(file_path)
+        media_type=IMAGE_FORMATS[fmt][2],
+        filename=f"plant{IMAGE_FORMATS[fmt][1]}",
+        headers=headers,
+        stat_result=stat_result
     )
 
-async def save_upload_image(file: UploadFile, plant_id: int) -> str:
+def _content_key(source) -> str:
+    """sha256 содержимого загрузки; файл читается по частям и возвращается в начало"""
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(1024 * 1024), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+def _process_image(source, sizes: list, formats: list, key: str = None) -> str:
     """
-    Сохраняет загруженное изображение в файл
-    Возвращает имя файла
-    """  
-    try:
-        if not file.content_type.startswith('image/'):
-            raise ValueError("Файл должен быть изображением")
+    Декодирует изображение один раз и сохраняет копии всех размеров sizes во всех форматах formats
+    (выполняется в пуле). source - файловый объект загрузки (пул потоков) или байты (пул процессов).
+    Возвращает ключ хранилища - хеш содержимого; повторная загрузка того же файла не перекодируется
+    """
+    key = key or _content_key(source)
+    if media_store.exists(key, MANIFEST_NAME):
+        return key
 
-        contents = await file.read()
-        image = Image.open(BytesIO(contents))
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    image = Image.open(source)
+    max_size = (sizes[-1], sizes[-1])
+    # Для JPEG декодируем сразу в уменьшенном масштабе (не меньше max_size), не распаковывая полный кадр
+    image.draft('RGB', max_size)
 
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
 
-        max_size = (1200, 1200)
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    # От большего размера к меньшему: каждая копия уменьшается из предыдущей, а не из оригинала
+    manifest = {}
+    written = []
+    try:
+        for size in reversed(sizes):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            manifest[size] = {}
+            for fmt in reversed(formats):
+                pil_format, _, mime, params = IMAGE_FORMATS[fmt]
+                buffer = BytesIO()
+                image.save(buffer, format=pil_format, **params)
+                data = buffer.getvalue()
+                written.append(object_name(size, fmt))
+                media_store.write(key, written[-1], lambda f: f.write(data), mime)
+                manifest[size][fmt] = len(data)
+        # Манифест пишется последним: по нему отдается самый легкий вариант, который принимает клиент
+        written.append(MANIFEST_NAME)
+        media_store.write(key, MANIFEST_NAME, lambda f: f.write(json.dumps(manifest).encode()), "application/json")
+    except Exception:
+        # Без манифеста на уже записанные копии не сошлется ни одно растение - удаляем их
+        media_store.delete(key, written)
+        raise
+    return key
 
-        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+async def upload_content_key(file: UploadFile) -> str:
+    """
+    Ключ изображения (хеш содержимого) до сохранения - чтобы заблокировать его на время
+    сохранения и создания растения (см. Plant.lock_image). Хеш считается в пуле обработки
+    изображений, поэтому при заполненной очереди загрузка сразу получает 429
+    """
+    if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    try:
+        await file.seek(0)
+        # Файловый объект нельзя передать в другой процесс
+        source = await file.read() if settings.IMAGE_EXECUTOR == "process" else file.file
+        return await run_image_job(_content_key, source)
+    finally:
+        await file.seek(0)
 
-        filename = f"{plant_id}_plant.jpg"
-        file_path = os.path.join(settings.MEDIA_ROOT, filename)
+async def save_upload_image(file: UploadFile, key: str = None) -> str:
+    """
+    Сохраняет загруженное изображение в хранилище
+    Возвращает ключ изображения (хеш содержимого); key - уже посчитанный upload_content_key
+    """  
+    try:
+        if not file.content_type.startswith('image/'):
+            raise ValueError("Файл должен быть изображением")
 
-        image.save(file_path, 'JPEG', quality=85, optimize=True)
+        # Starlette уже записал загрузку по частям во временный SpooledTemporaryFile,
+        # поэтому декодер читает прямо из него без копирования всего файла в память
+        if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Image is too large")
+        await file.seek(0)
+        if settings.IMAGE_EXECUTOR == "process":
+            # Файловый объект нельзя передать в другой процесс
+            source = await file.read()
+        else:
+            source = file.file
 
-        return filename
+        return await run_image_job(_process_image, source, settings.IMAGE_RENDITIONS, ENABLED_FORMATS, key)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error saving image: {e}")
         return ""
     finally:
         await file.seek(0)
 
-def delete_plant_image(filename: str) -> bool:
-    """Удаляет изображение растения"""
-    if not filename:
+def _legacy_paths(filename: str) -> list:
+    """Файлы изображения старого формата: копии всех размеров и форматов плоско в MEDIA_ROOT"""
+    name, _ = os.path.splitext(os.path.basename(filename))
+    paths = []
+    for size in settings.IMAGE_RENDITIONS:
+        base = name if size == settings.IMAGE_RENDITIONS[-1] else f"{name}_{size}"
+        paths.extend(_legacy_path(base + ext) for _, ext, _, _ in IMAGE_FORMATS.values())
+    return [path for path in paths if path is not None]
+
+async def delete_plant_image(image: str) -> bool:
+    """
+    Удаляет изображение из хранилища в отдельном потоке: удаление из S3 - сетевой запрос.
+    Одно изображение может принадлежать нескольким растениям - вызывающий проверяет, что ссылок больше нет
+    """
+    if not image:
         return True
-        
+    return await asyncio.to_thread(_delete_image, image)
+
+def _delete_image(image: str) -> bool:
     try:
-        file_path = os.path.join(settings.MEDIA_ROOT, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if is_content_key(image):
+            _manifests.invalidate(image)
+            media_store.delete(image, [MANIFEST_NAME] + [object_name(size, fmt) for size in settings.IMAGE_RENDITIONS for fmt in IMAGE_FORMATS])
+        else:
+            for path in _legacy_paths(image):
+                if os.path.exists(path):
+                    os.remove(path)
         return True
     except Exception as e:
         print(f"Error deleting image: {e}")
         return False
-
-def get_image_path(filename: str) -> Optional[str]:
-    """Возвращает полный путь к файлу изображения"""
-    if not filename:
-        return None
-    file_path = os.path.join(settings.MEDIA_ROOT, filename)
-    return file_path if os.path.exists(file_path) else None 
\ No newline at end of file
@@ -1,8 +1,9 @@
 from fastapi import HTTPException
 from datetime import datetime, UTC
 
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from models.plant import Plant
-from database import get_db
 
 def validate_title(title: str):
     if len(title) < 2 or len(title) > 20:
@@ -14,9 +15,8 @@ def validate_text(text: str):
         return False
     return True
 
-def validate_plant_id(plant_id: int):
-    db = next(get_db())
-    if not Plant.get_by_id(db, plant_id):
+async def validate_plant_id(db: AsyncSession, plant_id: int):
+    if not await Plant.get_by_id(db, plant_id):
         return False
     return True
 
@@ -31,7 +31,6 @@ class NoteCreate:
             [
                 validate_title(title) if title else True,
                 validate_text(text) if text else True,
-                validate_plant_id(plant_id) if plant_id else True,
                 validate_day(day) if day else True,
             ]
         ):
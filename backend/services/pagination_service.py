@@ -0,0 +1,17 @@
+from fastapi import HTTPException
+from datetime import datetime
+import base64
+import json
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Кодирует позицию (created_at, id) последней строки страницы в непрозрачный курсор"""
+    raw = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
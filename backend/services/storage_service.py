@@ -0,0 +1,216 @@
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, Optional
+
+_CONTENT_KEY = re.compile(r"^[0-9a-f]{64}$")
+
+# Объекты адресуются хешем содержимого и не меняются, поэтому их можно кешировать бессрочно
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+def is_content_key(key: str) -> bool:
+    """Ключ хранилища - sha256 содержимого в hex; иначе это имя файла старого формата"""
+    return bool(key) and bool(_CONTENT_KEY.match(key))
+
+def object_key(key: str, name: str) -> str:
+    """Относительный путь объекта: подкаталоги из префикса хеша, ab/cd/<hash>_<name>"""
+    return f"{key[:2]}/{key[2:4]}/{key}_{name}"
+
+class MediaStore(ABC):
+    """
+    Интерфейс хранилища изображений.
+    redirects=True означает, что клиент получает объект по ссылке (presigned_url), минуя API
+    """
+    redirects = False
+
+    @abstractmethod
+    def exists(self, key: str, name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def write(self, key: str, name: str, writer: Callable, content_type: str = None):
+        """Атомарно записывает объект: writer(file) пишет содержимое в переданный файловый объект"""
+
+    @abstractmethod
+    def read(self, key: str, name: str) -> Optional[bytes]:
+        """Содержимое объекта или None, если объекта нет"""
+
+    @abstractmethod
+    def delete(self, key: str, names: Iterable[str]):
+        ...
+
+    @abstractmethod
+    def stat(self, key: str, name: str) -> Optional[os.stat_result]:
+        """stat объекта (размер и время изменения) или None, если объекта нет"""
+
+    def presigned_url(self, key: str, name: str) -> str:
+        """Ссылка на объект для клиента - только у хранилищ с redirects=True"""
+        raise NotImplementedError(f"{type(self).__name__} не выдает ссылки на объекты")
+
+class LocalMediaStore(MediaStore):
+    """Хранилище на локальном диске: root/ab/cd/<hash>_<name>"""
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str, name: str) -> str:
+        return os.path.join(self.root, *object_key(key, name).split("/"))
+
+    def exists(self, key: str, name: str) -> bool:
+        return os.path.exists(self.path(key, name))
+
+    def write(self, key: str, name: str, writer: Callable, content_type: str = None):
+        """
+        Атомарно записывает объект: writer(file) пишет во временный файл в том же каталоге,
+        после чего файл переименовывается, и читатели никогда не видят его частично записанным
+        """
+        path = self.path(key, name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def read(self, key: str, name: str) -> Optional[bytes]:
+        try:
+            with open(self.path(key, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str, names: Iterable[str]):
+        for name in names:
+            try:
+                os.remove(self.path(key, name))
+            except FileNotFoundError:
+                pass
+
+    def stat(self, key: str, name: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(self.path(key, name))
+        except FileNotFoundError:
+            return None
+
+class S3MediaStore(MediaStore):
+    """
+    Хранилище в S3-совместимом объектном хранилище (AWS S3, MinIO и т.п.).
+    Изображения отдаются клиенту по presigned URL, байты не проходят через API.
+    Клиент boto3 создается лениво в каждом процессе и держит собственный пул соединений
+    """
+    redirects = True
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None, region: str = None,
+                 access_key_id: str = None, secret_access_key: str = None,
+                 presign_ttl: int = 300, max_pool_connections: int = 10):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.presign_ttl = presign_ttl
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+
+    def __getstate__(self):
+        # Клиент boto3 не передается в процессы пула обработки, там создается свой
+        state = self.__dict__.copy()
+        state["_client"] = None
+        return state
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import boto3
+                from botocore.config import Config
+            except ImportError as e:
+                raise RuntimeError("boto3 is required for MEDIA_STORAGE=s3") from e
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=self.endpoint_url,
+                region_name=self.region,
+                aws_access_key_id=self.access_key_id,
+                aws_secret_access_key=self.secret_access_key,
+                config=Config(max_pool_connections=self.max_pool_connections, retries={"mode": "standard"})
+            )
+        return self._client
+
+    def _object(self, key: str, name: str) -> str:
+        path = object_key(key, name)
+        return f"{self.prefix}/{path}" if self.prefix else path
+
+    def _head(self, key: str, name: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object(key, name))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, key: str, name: str) -> bool:
+        return self._head(key, name) is not None
+
+    def stat(self, key: str, name: str) -> Optional[os.stat_result]:
+        head = self._head(key, name)
+        if head is None:
+            return None
+        mtime = head["LastModified"].timestamp()
+        # Из полей stat у объекта S3 есть только размер и время изменения
+        return os.stat_result((0, 0, 0, 0, 0, 0, head["ContentLength"], mtime, mtime, mtime))
+
+    def write(self, key: str, name: str, writer: Callable, content_type: str = None):
+        """
+        Пишет объект через временный файл (в памяти, крупные - на диске) и загружает его потоково;
+        объект в S3 появляется только после успешного завершения загрузки
+        """
+        extra_args = {"CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as f:
+            writer(f)
+            f.seek(0)
+            self.client.upload_fileobj(f, self.bucket, self._object(key, name), ExtraArgs=extra_args)
+
+    def read(self, key: str, name: str) -> Optional[bytes]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._object(key, name))["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def delete(self, key: str, names: Iterable[str]):
+        objects = [{"Key": self._object(key, name)} for name in names]
+        if objects:
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+
+    def presigned_url(self, key: str, name: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object(key, name)},
+            ExpiresIn=self.presign_ttl
+        )
+
+def create_media_store(settings) -> MediaStore:
+    """Хранилище изображений по настройке MEDIA_STORAGE: "local" или "s3" """
+    if settings.MEDIA_STORAGE == "s3":
+        return S3MediaStore(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            presign_ttl=settings.S3_PRESIGN_TTL_SECONDS,
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS
+        )
+    return LocalMediaStore(settings.MEDIA_ROOT)
@@ -11,14 +11,63 @@ class Settings:
     POSTGRES_PORT: int = os.getenv("POSTGRES_PORT", 5432)
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "easy_db")
     DB_CREATED: bool = os.getenv("DB_CREATED", "false").lower() == "true"
+
+    # Пул соединений с БД
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
     
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     TOKEN_EXPIRE_MINUTES: int = int(os.getenv("TOKEN_EXPIRE_MINUTES", 5))
+    # Кеш проверенных токенов для verify_token
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+    # Кеш (is_active, role) пользователей для verify_user; изменения сбрасывают его во всех воркерах
+    # через Postgres NOTIFY, TTL - только страховка
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+
+    # Постраничная выдача списков
+    PAGE_SIZE: int = int(os.getenv("PAGE_SIZE", 50))
+    MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", 200))
+    CALENDAR_MAX_DAYS: int = int(os.getenv("CALENDAR_MAX_DAYS", 366))
 
     BASE_DIR: str = os.path.dirname(os.path.abspath(__file__))
     MEDIA_ROOT: str = os.path.join(BASE_DIR, "media")
     MEDIA_URL: str = "/media/"
 
+    # Хранилище изображений: "local" (MEDIA_ROOT) или "s3" (S3-совместимое, например MinIO)
+    MEDIA_STORAGE: str = os.getenv("MEDIA_STORAGE", "local")
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "easy-media")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "plants")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL") or None
+    S3_REGION: str = os.getenv("S3_REGION", "us-east-1")
+    S3_ACCESS_KEY_ID: str = os.getenv("S3_ACCESS_KEY_ID") or None
+    S3_SECRET_ACCESS_KEY: str = os.getenv("S3_SECRET_ACCESS_KEY") or None
+    # Время жизни ссылки на изображение, которую получает клиент
+    S3_PRESIGN_TTL_SECONDS: int = int(os.getenv("S3_PRESIGN_TTL_SECONDS", 300))
+    S3_MAX_POOL_CONNECTIONS: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 20))
+
+    # Размеры (по большей стороне) сохраняемых копий изображения, последний - основной файл
+    IMAGE_RENDITIONS: list = sorted(int(size) for size in os.getenv("IMAGE_RENDITIONS", "128,384,1200").split(","))
+
+    # Сколько манифестов изображений (размеры вариантов для выбора самого легкого) держать в памяти
+    IMAGE_MANIFEST_CACHE_SIZE: int = int(os.getenv("IMAGE_MANIFEST_CACHE_SIZE", 10000))
+
+    # Дополнительные форматы копий помимо JPEG (используются, если их поддерживает Pillow)
+    IMAGE_EXTRA_FORMATS: list = [fmt.strip() for fmt in os.getenv("IMAGE_EXTRA_FORMATS", "webp,avif").split(",") if fmt.strip()]
+
+    # Максимальный размер загружаемого изображения и тела запроса целиком (изображение + поля формы)
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", 15 * 1024 * 1024))
+    MAX_REQUEST_BYTES: int = MAX_UPLOAD_BYTES + 64 * 1024
+
+    # Обработка изображений вне event loop: "thread" или "process"
+    IMAGE_EXECUTOR: str = os.getenv("IMAGE_EXECUTOR", "thread")
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", min(4, os.cpu_count() or 1)))
+    # Сколько изображений может одновременно ждать/обрабатываться, сверх - 429
+    IMAGE_QUEUE_LIMIT: int = int(os.getenv("IMAGE_QUEUE_LIMIT", 16))
+
 @lru_cache
 def get_settings():
     return Settings()
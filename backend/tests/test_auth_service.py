@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from models.user import User
+from services import auth_service
+from services.auth_service import AuthService, user_cache, user_cache_listener
+
+USER_ID = 42
+
+
+class _User:
+    is_active = True
+    role = "user"
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(user_cache_listener, "connected", True)
+    user_cache.clear()
+    yield AuthService()
+    user_cache.clear()
+
+
+def _credentials(service):
+    token = service.create_token({"sub": str(USER_ID)})
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_cache_miss_is_cached(service, monkeypatch):
+    async def get_by_id(db, user_id, options=()):
+        return _User()
+    monkeypatch.setattr(User, "get_by_id", get_by_id)
+
+    user = asyncio.run(service.verify_user(_credentials(service), None))
+
+    assert user.id == USER_ID and user.is_active
+    assert user_cache.get(USER_ID) == (True, "user")
+
+
+def test_invalidation_during_db_read_is_not_overwritten(service, monkeypatch):
+    async def get_by_id(db, user_id, options=()):
+        # Пока читается строка, другой воркер выполняет выход и присылает NOTIFY
+        user_cache_listener._on_notify(None, 0, auth_service.USER_INVALIDATION_CHANNEL, str(user_id))
+        return _User()
+    monkeypatch.setattr(User, "get_by_id", get_by_id)
+
+    asyncio.run(service.verify_user(_credentials(service), None))
+
+    assert user_cache.get(USER_ID) is None
+
+
+def test_cache_clear_during_db_read_is_not_overwritten(service, monkeypatch):
+    async def get_by_id(db, user_id, options=()):
+        # Переподключение слушателя очищает кеш: уведомления могли потеряться
+        auth_service._clear_user_cache()
+        return _User()
+    monkeypatch.setattr(User, "get_by_id", get_by_id)
+
+    asyncio.run(service.verify_user(_credentials(service), None))
+
+    assert user_cache.get(USER_ID) is None
+
+
+def test_deleted_user_is_unauthorized(service, monkeypatch):
+    async def get_by_id(db, user_id, options=()):
+        return None
+    monkeypatch.setattr(User, "get_by_id", get_by_id)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(service.verify_user(_credentials(service), None))
+
+    assert error.value.status_code == 401
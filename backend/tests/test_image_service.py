@@ -0,0 +1,218 @@
+import asyncio
+import io
+import json
+import os
+
+import boto3
+import pytest
+from fastapi import HTTPException
+from moto import mock_aws
+from PIL import Image
+
+from services import image_service
+from services.image_service import (
+    ENABLED_FORMATS, IMAGE_FORMATS, MANIFEST_NAME, get_plant_image, object_name, _delete_image, _process_image
+)
+from services.storage_service import LocalMediaStore, S3MediaStore
+
+SIZES = [128, 384]
+ACCEPT_ALL = "image/avif,image/webp,image/*"
+
+
+@pytest.fixture
+def media_root(tmp_path, monkeypatch):
+    root = tmp_path / "media"
+    root.mkdir()
+    monkeypatch.setattr(image_service.settings, "MEDIA_ROOT", str(root))
+    return root
+
+
+def test_legacy_image_is_served_from_media_root(media_root):
+    (media_root / "plant.jpg").write_bytes(b"jpeg-bytes")
+
+    response = asyncio.run(get_plant_image("plant.jpg"))
+
+    assert response.status_code == 200
+    assert response.path == os.path.join(os.path.realpath(media_root), "plant.jpg")
+
+
+@pytest.mark.parametrize("image", ["/etc/passwd", "../secret.jpg", "..", "sub/../../secret.jpg"])
+def test_legacy_image_cannot_escape_media_root(media_root, image):
+    (media_root.parent / "secret.jpg").write_bytes(b"secret")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_plant_image(image))
+
+    assert error.value.status_code == 404
+
+
+def test_legacy_symlink_outside_media_root_is_not_served(media_root):
+    (media_root.parent / "secret.jpg").write_bytes(b"secret")
+    os.symlink(media_root.parent / "secret.jpg", media_root / "link.jpg")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_plant_image("link.jpg"))
+
+    assert error.value.status_code == 404
+
+
+def test_legacy_delete_stays_in_media_root(media_root):
+    outside = media_root.parent / "secret.webp"
+    outside.write_bytes(b"secret")
+    (media_root / "secret.jpg").write_bytes(b"jpeg")
+
+    assert _delete_image("../secret.jpg")
+
+    # Удаляются только файлы с тем же именем внутри MEDIA_ROOT
+    assert outside.exists()
+    assert not (media_root / "secret.jpg").exists()
+
+
+def _jpeg(size=(640, 480)) -> bytes:
+    buffer = io.BytesIO()
+    # Плавный градиент: на таком изображении размеры форматов заметно различаются
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _manifest(store, key) -> dict:
+    return {int(width): sizes for width, sizes in json.loads(store.read(key, MANIFEST_NAME)).items()}
+
+
+@pytest.fixture
+def local_store(tmp_path, monkeypatch):
+    store = LocalMediaStore(str(tmp_path / "store"))
+    monkeypatch.setattr(image_service, "media_store", store)
+    monkeypatch.setattr(image_service.settings, "IMAGE_RENDITIONS", SIZES)
+    image_service._manifests.clear()
+    return store
+
+
+def test_process_image_writes_manifest_with_variant_sizes(local_store):
+    key = _process_image(_jpeg(), SIZES, ENABLED_FORMATS)
+
+    manifest = _manifest(local_store, key)
+    assert set(manifest) == set(SIZES)
+    for width in SIZES:
+        for fmt in ENABLED_FORMATS:
+            assert manifest[width][fmt] == local_store.stat(key, object_name(width, fmt)).st_size
+
+
+def test_failed_encode_removes_written_renditions(local_store, monkeypatch):
+    # Кодировщик падает на последней копии, когда остальные уже записаны
+    saves = []
+    save = Image.Image.save
+
+    def failing_save(self, *args, **kwargs):
+        saves.append(args)
+        if len(saves) == len(SIZES) * len(ENABLED_FORMATS):
+            raise OSError("encoder error")
+        return save(self, *args, **kwargs)
+    monkeypatch.setattr(Image.Image, "save", failing_save)
+    data = _jpeg()
+
+    with pytest.raises(OSError):
+        _process_image(data, SIZES, ENABLED_FORMATS)
+
+    key = image_service._content_key(data)
+    assert not local_store.exists(key, MANIFEST_NAME)
+    for width in SIZES:
+        for fmt in ENABLED_FORMATS:
+            assert not local_store.exists(key, object_name(width, fmt))
+
+
+@pytest.mark.parametrize("accept", [ACCEPT_ALL, "image/webp", "image/jpeg", None])
+def test_smallest_accepted_variant_is_served(local_store, accept):
+    key = _process_image(_jpeg(), SIZES, ENABLED_FORMATS)
+    manifest = _manifest(local_store, key)
+
+    for width in SIZES:
+        response = asyncio.run(get_plant_image(key, width, {"accept": accept} if accept else {}))
+
+        accepted = image_service._accepted_formats(accept)
+        expected = min((fmt for fmt in ENABLED_FORMATS if fmt in accepted), key=manifest[width].get)
+        assert response.media_type == IMAGE_FORMATS[expected][2]
+        assert response.path == local_store.path(key, object_name(width, expected))
+
+
+def test_manifest_is_read_once(local_store, monkeypatch):
+    key = _process_image(_jpeg(), SIZES, ENABLED_FORMATS)
+    reads = []
+    read = local_store.read
+    monkeypatch.setattr(local_store, "read", lambda *args: reads.append(args) or read(*args))
+
+    for _ in range(3):
+        asyncio.run(get_plant_image(key, 128, {"accept": ACCEPT_ALL}))
+
+    assert len(reads) == 1
+
+
+def test_variant_without_manifest_is_chosen_by_size(local_store):
+    # Изображения, загруженные до появления манифестов
+    key = _process_image(_jpeg(), SIZES, ENABLED_FORMATS)
+    local_store.delete(key, [MANIFEST_NAME])
+    image_service._manifests.clear()
+    sizes = {fmt: local_store.stat(key, object_name(128, fmt)).st_size for fmt in ENABLED_FORMATS}
+
+    response = asyncio.run(get_plant_image(key, 128, {"accept": ACCEPT_ALL}))
+
+    assert response.media_type == IMAGE_FORMATS[min(sizes, key=sizes.get)][2]
+
+
+def test_delete_removes_manifest(local_store):
+    key = _process_image(_jpeg(), SIZES, ENABLED_FORMATS)
+
+    assert _delete_image(key)
+
+    assert not local_store.exists(key, MANIFEST_NAME)
+    assert not local_store.exists(key, object_name(128, "jpeg"))
+
+
+def test_s3_redirect_to_smallest_accepted_variant(monkeypatch):
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="media")
+        store = S3MediaStore(bucket="media", region="us-east-1", access_key_id="test", secret_access_key="test")
+        monkeypatch.setattr(image_service, "media_store", store)
+        monkeypatch.setattr(image_service.settings, "IMAGE_RENDITIONS", SIZES)
+        image_service._manifests.clear()
+        key = _process_image(_jpeg(), SIZES, ENABLED_FORMATS)
+        sizes = _manifest(store, key)[128]
+
+        response = asyncio.run(get_plant_image(key, 128, {"accept": ACCEPT_ALL}))
+
+        assert response.status_code == 307
+        assert object_name(128, min(sizes, key=sizes.get)) in response.headers["location"]
+
+
+def _upload(data: bytes):
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+    return UploadFile(io.BytesIO(data), size=len(data), filename="plant.jpg",
+                      headers=Headers({"content-type": "image/jpeg"}))
+
+
+def test_upload_content_key_is_hashed_in_image_pool(monkeypatch):
+    import threading
+    threads = []
+    content_key = image_service._content_key
+
+    def recording_content_key(source):
+        threads.append(threading.current_thread().name)
+        return content_key(source)
+    monkeypatch.setattr(image_service, "_content_key", recording_content_key)
+    data = _jpeg()
+
+    key = asyncio.run(image_service.upload_content_key(_upload(data)))
+
+    assert key == content_key(data)
+    assert threads and threads[0].startswith("image")
+
+
+def test_upload_content_key_respects_queue_limit(monkeypatch):
+    monkeypatch.setattr(image_service, "_in_flight", image_service.settings.IMAGE_QUEUE_LIMIT)
+    monkeypatch.setattr(image_service, "_content_key", lambda source: pytest.fail("hashed past the queue limit"))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(image_service.upload_content_key(_upload(_jpeg())))
+
+    assert error.value.status_code == 429
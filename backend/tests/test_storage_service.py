@@ -0,0 +1,80 @@
+import boto3
+import pytest
+import requests
+from moto import mock_aws
+
+from services.storage_service import (
+    IMMUTABLE_CACHE_CONTROL, LocalMediaStore, MediaStore, S3MediaStore, object_key
+)
+
+KEY = "ab" * 32
+NAMES = ["1024.jpeg", "256.webp"]
+
+
+def _writer(data: bytes):
+    return lambda f: f.write(data)
+
+
+@pytest.fixture
+def s3_store():
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="media")
+        yield S3MediaStore(
+            bucket="media", prefix="plants", region="us-east-1",
+            access_key_id="test", secret_access_key="test", presign_ttl=60
+        )
+
+
+def test_media_store_is_abstract():
+    with pytest.raises(TypeError):
+        MediaStore()
+
+
+def test_s3_write_exists_stat(s3_store):
+    assert not s3_store.exists(KEY, NAMES[0])
+    assert s3_store.stat(KEY, NAMES[0]) is None
+
+    s3_store.write(KEY, NAMES[0], _writer(b"jpeg-bytes"), "image/jpeg")
+
+    assert s3_store.exists(KEY, NAMES[0])
+    assert s3_store.stat(KEY, NAMES[0]).st_size == len(b"jpeg-bytes")
+    head = s3_store.client.head_object(Bucket="media", Key=f"plants/{object_key(KEY, NAMES[0])}")
+    assert head["ContentType"] == "image/jpeg"
+    assert head["CacheControl"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_s3_delete(s3_store):
+    for name in NAMES:
+        s3_store.write(KEY, name, _writer(b"data"))
+
+    s3_store.delete(KEY, NAMES)
+
+    assert not any(s3_store.exists(KEY, name) for name in NAMES)
+    # Удаление отсутствующих объектов и пустого списка не считается ошибкой
+    s3_store.delete(KEY, NAMES)
+    s3_store.delete(KEY, [])
+
+
+def test_s3_presigned_url(s3_store):
+    s3_store.write(KEY, NAMES[0], _writer(b"jpeg-bytes"), "image/jpeg")
+
+    url = s3_store.presigned_url(KEY, NAMES[0])
+
+    assert f"plants/{object_key(KEY, NAMES[0])}" in url
+    # moto перехватывает и HTTP-запросы requests: ссылка отдает записанный объект
+    response = requests.get(url)
+    assert response.status_code == 200
+    assert response.content == b"jpeg-bytes"
+
+
+def test_local_store_roundtrip(tmp_path):
+    store = LocalMediaStore(str(tmp_path))
+
+    store.write(KEY, NAMES[0], _writer(b"jpeg-bytes"))
+
+    assert store.exists(KEY, NAMES[0])
+    assert store.stat(KEY, NAMES[0]).st_size == len(b"jpeg-bytes")
+    store.delete(KEY, NAMES)
+    assert not store.exists(KEY, NAMES[0])
+    with pytest.raises(NotImplementedError):
+        store.presigned_url(KEY, NAMES[0])
@@ -0,0 +1,26 @@
+"""add_plant_classification_status
+
+Revision ID: 3f8c1d6e2a47
+Revises: e7b2f4a91c05
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8c1d6e2a47'
+down_revision: Union[str, None] = 'e7b2f4a91c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Статус фоновой классификации изображения растения: pending, done, failed
+    op.add_column('plants', sa.Column('classification_status', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('plants', 'classification_status')
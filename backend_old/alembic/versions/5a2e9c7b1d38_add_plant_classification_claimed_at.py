@@ -0,0 +1,26 @@
+"""add_plant_classification_claimed_at
+
+Revision ID: 5a2e9c7b1d38
+Revises: 3f8c1d6e2a47
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5a2e9c7b1d38'
+down_revision: Union[str, None] = '3f8c1d6e2a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Время, когда воркер забрал задание фоновой классификации (статус running)
+    op.add_column('plants', sa.Column('classification_claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('plants', 'classification_claimed_at')
@@ -0,0 +1,29 @@
+"""add_plant_embedding
+
+Revision ID: e7b2f4a91c05
+Revises: 92c9d932c597
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2f4a91c05'
+down_revision: Union[str, None] = '92c9d932c597'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Эмбеддинг изображения растения для поиска похожих (заполняется при загрузке изображения)
+    op.add_column('plants', sa.Column('embedding', sa.LargeBinary(), nullable=True))
+    # Индекс похожих сверяется с базой по растениям пользователя
+    op.create_index('ix_plants_user_id', 'plants', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_plants_user_id', table_name='plants')
+    op.drop_column('plants', 'embedding')
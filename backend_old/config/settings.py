@@ -39,6 +39,40 @@ class Settings(BaseSettings):
     DEV_CORS_ORIGINS: str = os.getenv("DEV_CORS_ORIGINS", "http://localhost:3000")
     PROD_CORS_ORIGINS: str = os.getenv("PROD_CORS_ORIGINS", "https://your-production-domain.com")
 
+    # Модель классификации: директория (по умолчанию plants_classification) и бэкенд инференса:
+    # torch (fp32), torch-int8, onnx, onnx-int8 - артефакты готовит scripts/export_model.py
+    AI_MODEL_PATH: str = os.getenv("AI_MODEL_PATH", "")
+    AI_BACKEND: str = os.getenv("AI_BACKEND", "torch")
+
+    # fp32-веса отображаются в память (mmap) и общие для всех воркеров uvicorn
+    AI_MMAP_WEIGHTS: bool = os.getenv("AI_MMAP_WEIGHTS", "true").lower() == "true"
+    # Куда один раз сохраняются веса для mmap (директория модели при этом не меняется)
+    AI_WEIGHTS_CACHE_DIR: str = os.getenv(
+        "AI_WEIGHTS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "plants_classification")
+    )
+
+    # Микробатчинг запросов к модели классификации
+    AI_MAX_BATCH_SIZE: int = int(os.getenv("AI_MAX_BATCH_SIZE", "8"))
+    AI_MAX_BATCH_WAIT_MS: float = float(os.getenv("AI_MAX_BATCH_WAIT_MS", "10"))
+
+    # Векторная подготовка батча вместо ViTImageProcessor и декодирование JPEG сразу в уменьшенном
+    # масштабе (draft); сверка с ViTImageProcessor - scripts/check_preprocessing.py
+    AI_FAST_PREPROCESSING: bool = os.getenv("AI_FAST_PREPROCESSING", "true").lower() == "true"
+    AI_JPEG_DRAFT: bool = os.getenv("AI_JPEG_DRAFT", "true").lower() == "true"
+
+    # Кеш результатов классификации по хешу изображения; AI_CACHE_PHASH_DISTANCE >= 0 включает
+    # поиск почти одинаковых изображений по перцептивному хешу (допустимое число отличающихся битов)
+    AI_CACHE_SIZE: int = int(os.getenv("AI_CACHE_SIZE", "1024"))
+    AI_CACHE_TTL_SECONDS: float = float(os.getenv("AI_CACHE_TTL_SECONDS", "3600"))
+    AI_CACHE_PHASH_DISTANCE: int = int(os.getenv("AI_CACHE_PHASH_DISTANCE", "-1"))
+
+    # Фоновая классификация: растение с изображением, но без вида, создается сразу, а вид
+    # заполняют воркеры очереди (статус - поле classification_status растения)
+    AI_BACKGROUND_CLASSIFICATION: bool = os.getenv("AI_BACKGROUND_CLASSIFICATION", "false").lower() == "true"
+    AI_CLASSIFICATION_WORKERS: int = int(os.getenv("AI_CLASSIFICATION_WORKERS", "2"))
+    # Аренда задания воркером: задание в статусе running дольше этого срока забирается заново
+    AI_CLASSIFICATION_LEASE_SECONDS: int = int(os.getenv("AI_CLASSIFICATION_LEASE_SECONDS", "900"))
+
     @property
     def allowed_origins(self) -> List[str]:
         """Получить список разрешенных origins в зависимости от окружения"""
@@ -1,9 +1,13 @@
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from routers import auth, users, sessions, ai, plants, notes
 from services.ai_service import ai_service
+from services.plant_classification import start_background_classification, stop_background_classification
 from config.settings import get_settings
+from database import SessionLocal
+from services.plant_embeddings import backfill_embeddings
 
 settings = get_settings()
 
@@ -54,9 +58,33 @@ app.include_router(notes.router, prefix=settings.API_PREFIX, tags=["Notes"])
 @app.on_event("startup")
 async def startup_event():
     """Выполняется при запуске приложения"""
-    # Загружаем модель
-    if not ai_service.load_model():
-        print("ПРЕДУПРЕЖДЕНИЕ: Не удалось загрузить модель!")
+    # Модель загружается в фоне: остальные маршруты доступны сразу, классификация - после /health/ready
+    ai_service.start_loading()
+    app.state.backfill_task = asyncio.create_task(backfill_plant_embeddings())
+    if settings.AI_BACKGROUND_CLASSIFICATION:
+        start_background_classification()
+
+async def backfill_plant_embeddings():
+    """После загрузки модели досчитывает эмбеддинги изображений растений, у которых их еще нет"""
+    await ai_service.wait_loaded()
+    if not ai_service.ready:
+        return
+    db = SessionLocal()
+    try:
+        count = await backfill_embeddings(db, settings.AI_MAX_BATCH_SIZE)
+        if count:
+            print(f"Посчитаны эмбеддинги изображений растений: {count}")
+    except Exception as e:
+        print(f"Ошибка при подсчете эмбеддингов изображений растений: {e}")
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Выполняется при остановке приложения"""
+    app.state.backfill_task.cancel()
+    await stop_background_classification()
+    await ai_service.batcher.stop()
 
 @app.get("/")
 async def root():
@@ -80,6 +108,23 @@ async def root():
     
     return response
 
+@app.get(f"{settings.API_PREFIX}/health/live")
+async def liveness():
+    """Процесс жив и обслуживает запросы"""
+    return {"status": "alive"}
+
+@app.get(f"{settings.API_PREFIX}/health/ready")
+async def readiness():
+    """
+    Готовность к классификации: 200, когда модель загружена и прогрета, иначе 503
+    """
+    body = {"status": ai_service.state, "backend": ai_service.backend}
+    if not ai_service.ready:
+        if ai_service.load_error:
+            body["error"] = ai_service.load_error
+        return JSONResponse(status_code=503, content=body)
+    return body
+
 @app.middleware("http")
 async def add_environment_header(request: Request, call_next):
     """Добавляем информацию об окружении в заголовки ответа"""
@@ -1,12 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, LargeBinary
 from sqlalchemy.sql import func
-from sqlalchemy.orm import Session, relationship
+from sqlalchemy.orm import Session, relationship, deferred
 from database import Base
 from typing import Optional, List
 import os
 import uuid
 import shutil
 from fastapi import UploadFile
+from config.settings import get_settings
+
+settings = get_settings()
 
 class Plant(Base):
     __tablename__ = "plants"
@@ -16,6 +19,12 @@ class Plant(Base):
     species = Column(String, nullable=True)
     description = Column(Text, nullable=True)
     image_path = Column(String, nullable=True)
+    # Эмбеддинг изображения (float32, единичной длины) для поиска похожих растений
+    embedding = deferred(Column(LargeBinary, nullable=True))
+    # Фоновая классификация (AI_BACKGROUND_CLASSIFICATION): pending -> running -> done | failed, None - не запрашивалась
+    classification_status = Column(String, nullable=True)
+    # Когда воркер забрал задание (running); по истечении аренды задание забирает заново другой воркер
+    classification_claimed_at = Column(DateTime(timezone=False), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime(timezone=False), server_default=func.now())
     updated_at = Column(DateTime(timezone=False), server_default=func.now(), onupdate=func.now())
@@ -73,8 +82,11 @@ class Plant(Base):
         if plant.image_path and os.path.exists(plant.image_path):
             os.remove(plant.image_path)
         
-        # Обновляем путь к изображению в БД
+        # Обновляем путь к изображению в БД; эмбеддинг старого изображения больше не действителен
         plant.image_path = image_path
+        plant.embedding = None
+        if settings.AI_BACKGROUND_CLASSIFICATION and not plant.species:
+            plant.classification_status = "pending"
         db.commit()
         db.refresh(plant)
         
@@ -85,6 +97,13 @@ class Plant(Base):
         """Получить растение по ID"""
         return db.query(cls).filter(cls.id == plant_id).first()
     
+    @classmethod
+    def get_by_ids(cls, db: Session, plant_ids: List[int]):
+        """Получить растения по списку ID"""
+        if not plant_ids:
+            return []
+        return db.query(cls).filter(cls.id.in_(plant_ids)).all()
+    
     @classmethod
     def get_user_plants(cls, db: Session, user_id: int):
         """Получить все растения пользователя"""
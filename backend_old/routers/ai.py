@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Security, status, UploadFile, File
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from database import get_db
 from models.user import User
 from routers.auth import get_current_user
-from services.ai_service import ai_service
-import os
-import uuid
-from typing import Dict, List
+from services.ai_service import ai_service, ModelNotReadyError
+from services.classification_queue import classification_queue
+from services.roles import admin_required
+from PIL import UnidentifiedImageError
+from typing import Dict, List, Optional
 
 router = APIRouter()
 
@@ -15,10 +16,12 @@ class PredictionResponse(BaseModel):
     predicted_class: str
     confidence: float
     probabilities: Dict[str, float]
+    embedding: Optional[List[float]] = None
 
 @router.post(
     "/ai/classify-plant",
     response_model=PredictionResponse,
+    response_model_exclude_none=True,
     description="Классификация растения по изображению",
     responses={
         status.HTTP_200_OK: {
@@ -37,12 +40,32 @@ class PredictionResponse(BaseModel):
                 }
             }
         },
+        status.HTTP_400_BAD_REQUEST: {
+            "description": "Загруженный файл не является изображением",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Файл не является изображением"
+                    }
+                }
+            }
+        },
         status.HTTP_500_INTERNAL_SERVER_ERROR: {
             "description": "Ошибка при обработке запроса",
             "content": {
                 "application/json": {
                     "example": {
-                        "detail": "Модель не загружена"
+                        "detail": "Ошибка при обработке запроса: ..."
+                    }
+                }
+            }
+        },
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "description": "Модель еще загружается после запуска сервиса",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Модель еще не загружена"
                     }
                 }
             }
@@ -51,6 +74,8 @@ class PredictionResponse(BaseModel):
 )
 async def classify_plant(
     file: UploadFile = File(..., description="Изображение растения для классификации"),
+    top_k: Optional[int] = Query(None, ge=1, description="Вернуть вероятности только k самых вероятных классов"),
+    embedding: bool = Query(False, description="Добавить в ответ эмбеддинг изображения (для поиска похожих)"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -58,27 +83,30 @@ async def classify_plant(
     Эндпоинт для классификации растений по изображению
     """
     try:
-        # Создаем временную директорию для сохранения загруженных файлов, если её нет
-        upload_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Генерируем уникальное имя файла
-        file_extension = os.path.splitext(file.filename)[1]
-        temp_file_name = f"{uuid.uuid4()}{file_extension}"
-        temp_file_path = os.path.join(upload_dir, temp_file_name)
-        
-        # Сохраняем загруженный файл
-        with open(temp_file_path, "wb") as buffer:
-            buffer.write(await file.read())
-        
-        # Получаем предсказание
-        result = ai_service.predict(temp_file_path)
-        
-        # Удаляем временный файл
-        os.remove(temp_file_path)
-        
-        return result
+        # Starlette уже принял загрузку во временный SpooledTemporaryFile (небольшие файлы - в памяти),
+        # изображение декодируется прямо из него без промежуточной записи на диск
+        await file.seek(0)
+        return await ai_service.classify(file.file, top_k, embedding)
+    except ModelNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="Файл не является изображением")
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при обработке запроса: {str(e)}")
+
+@router.get(
+    "/ai/stats",
+    description="Статистика модели классификации и кеша предсказаний",
+    dependencies=[Security(admin_required)]
+)
+async def get_ai_stats():
+    """
+    Бэкенд модели, среднее время инференса одного изображения и статистика кеша:
+    попадания (в т.ч. почти одинаковые изображения), промахи и сэкономленное время,
+    а также состояние очереди фоновой классификации
+
+    Доступно только для администраторов.
+    """
+    return {**ai_service.stats(), "classification_queue": classification_queue.stats()}
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from database import get_db
 from models.plant import Plant
 from models.user import User
-from schemas.plants import PlantCreate, PlantResponse, PlantUpdate
+from schemas.plants import PlantCreate, PlantResponse, PlantUpdate, SimilarPlantResponse
 from routers.auth import get_current_user
+from services.ai_service import ModelNotReadyError
+from services.plant_embeddings import index_plant_image, update_embedding, get_similar
+from services.similarity_index import similarity_index
 
 router = APIRouter()
 
@@ -33,6 +36,8 @@ async def create_plant(
         description=description,
         image=image
     )
+    if plant.image_path:
+        await index_plant_image(db, plant)
     return plant
 
 @router.get(
@@ -75,6 +80,54 @@ def get_plant(
     
     return plant
 
+@router.get(
+    "/plants/{plant_id}/similar",
+    response_model=List[SimilarPlantResponse],
+    description="Растения пользователя с наиболее похожими изображениями"
+)
+async def get_similar_plants(
+    plant_id: int,
+    limit: int = Query(5, ge=1, le=50, description="Сколько похожих растений вернуть"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Растения пользователя с наиболее похожими изображениями (поиск по индексу эмбеддингов)"""
+    plant = Plant.get_by_id(db, plant_id)
+    if not plant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Растение не найдено"
+        )
+    
+    # Проверяем, принадлежит ли растение пользователю
+    if plant.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нет доступа к этому растению"
+        )
+    
+    if not plant.image_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="У растения нет изображения"
+        )
+    
+    # Изображение загружено, пока модель загружалась, и еще не обработано - считаем эмбеддинг сейчас
+    if plant.embedding is None:
+        try:
+            await update_embedding(db, plant)
+        except ModelNotReadyError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": "5"}
+            )
+    
+    return [
+        SimilarPlantResponse(plant=PlantResponse.model_validate(similar), similarity=similarity)
+        for similar, similarity in get_similar(db, plant, limit)
+    ]
+
 @router.patch(
     "/plants/{plant_id}",
     response_model=PlantResponse,
@@ -137,6 +190,7 @@ async def update_plant_image(
     
     # Обновляем изображение
     updated_plant = await Plant.save_image(db, plant_id, image)
+    await index_plant_image(db, updated_plant)
     
     return updated_plant
 
@@ -166,5 +220,6 @@ def delete_plant(
     
     # Удаляем растение
     result = plant.delete(db)
+    similarity_index.remove(plant_id)
     
     return result 
\ No newline at end of file
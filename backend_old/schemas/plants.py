@@ -21,6 +21,9 @@ class PlantResponse(PlantBase):
     id: int
     user_id: int
     image_path: Optional[str] = None
+    classification_status: Optional[str] = Field(
+        None, description="Фоновая классификация изображения: pending, running, done (вид заполнен, если распознан), failed"
+    )
     created_at: datetime
     updated_at: datetime
 
@@ -39,6 +42,6 @@ class PlantResponse(PlantBase):
             }
         }
 
-    
-
-
+class SimilarPlantResponse(BaseModel):
+    plant: PlantResponse
+    similarity: float = Field(..., description="Косинусная близость эмбеддингов изображений (от -1 до 1)")
@@ -0,0 +1,68 @@
+"""
+Сверка быстрой подготовки изображений (services/image_preprocessing.py) с ViTImageProcessor.
+
+Запуск из директории backend_old:
+    python scripts/check_preprocessing.py path/to/images [--limit 200]
+
+Без draft результат должен совпадать с ViTImageProcessor с точностью до округления float32
+(иначе скрипт завершается с кодом 1). С draft JPEG декодируется в уменьшенном масштабе,
+поэтому пиксели немного отличаются - для него выводится отклонение и время.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import ViTImageProcessor
+
+from services.ai_service import VENDORED_PROCESSOR_PATH
+from services.image_preprocessing import ImagePreprocessor, decode_image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сверка быстрой подготовки изображений с ViTImageProcessor")
+    parser.add_argument("images", help="директория с изображениями (обходится рекурсивно)")
+    parser.add_argument("--processor", default=VENDORED_PROCESSOR_PATH)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--tolerance", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(args.images)
+        for name in files if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:args.limit]
+    if not paths:
+        print(f"В {args.images} нет изображений")
+        sys.exit(1)
+
+    processor = ViTImageProcessor.from_pretrained(args.processor)
+    preprocessor = ImagePreprocessor.from_processor(processor)
+
+    def run(decode, prepare):
+        start = time.perf_counter()
+        pixel_values = torch.cat([prepare([decode(path)]) for path in paths])
+        return pixel_values, (time.perf_counter() - start) / len(paths)
+
+    reference, reference_time = run(decode_image, lambda images: processor(images=images, return_tensors="pt")["pixel_values"])
+    fast, fast_time = run(decode_image, preprocessor)
+    drafted, drafted_time = run(lambda path: decode_image(path, preprocessor.size), preprocessor)
+
+    fast_diff = (fast - reference).abs().max().item()
+    print(f"{'path':<22} {'max |dx|':>10} {'mean |dx|':>10} {'ms/img':>8}")
+    print(f"{'ViTImageProcessor':<22} {0:>10} {0:>10} {reference_time * 1000:>8.2f}")
+    print(f"{'fast':<22} {fast_diff:>10.2e} {(fast - reference).abs().mean().item():>10.2e} {fast_time * 1000:>8.2f}")
+    print(f"{'fast + draft':<22} {(drafted - reference).abs().max().item():>10.2e} {(drafted - reference).abs().mean().item():>10.2e} {drafted_time * 1000:>8.2f}")
+
+    if fast_diff > args.tolerance:
+        print(f"Быстрая подготовка расходится с ViTImageProcessor: {fast_diff:.2e} > {args.tolerance}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
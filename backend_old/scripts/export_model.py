@@ -0,0 +1,180 @@
+"""
+Экспорт модели классификации растений для инференса на CPU и проверка точности экспорта.
+
+Форматы (имена совпадают с AI_BACKEND):
+    torch-int8 - динамическая int8-квантизация PyTorch (model_int8.pt)
+    onnx       - ONNX для ONNX Runtime (model.onnx)
+    onnx-int8  - ONNX с динамической int8-квантизацией весов (model_int8.onnx)
+
+Запуск из директории backend_old:
+    python scripts/export_model.py --source ../model/main/plants-classification \\
+        --formats torch-int8 onnx onnx-int8 --holdout path/to/holdout
+
+Отложенная выборка (--holdout) - директория с поддиректориями по названиям классов (id2label),
+как в исходном датасете. Для каждого формата сравниваются предсказания с fp32-моделью;
+если доля совпадений top-1 ниже --min-agreement, скрипт завершается с кодом 1.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from PIL import Image
+from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
+
+from services.ai_service import AIService, MODEL_BACKENDS, VENDORED_PROCESSOR_PATH, quantize_int8
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+class _LogitsAndEmbedding(torch.nn.Module):
+    """Обертка для экспорта в ONNX: вход pixel_values, выходы logits и embedding (CLS-токен)"""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        embedding = self.model.vit(pixel_values=pixel_values).last_hidden_state[:, 0, :]
+        return self.model.classifier(embedding), embedding
+
+
+def export_torch_int8(model, output_dir: str):
+    quantized = quantize_int8(model)
+    torch.save(quantized.state_dict(), os.path.join(output_dir, MODEL_BACKENDS["torch-int8"]))
+
+
+def export_onnx(model, output_dir: str):
+    size = model.config.image_size
+    dummy = torch.randn(1, model.config.num_channels, size, size)
+    torch.onnx.export(
+        _LogitsAndEmbedding(model),
+        (dummy,),
+        os.path.join(output_dir, MODEL_BACKENDS["onnx"]),
+        input_names=["pixel_values"],
+        output_names=["logits", "embedding"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}, "embedding": {0: "batch"}},
+        opset_version=17,
+        dynamo=False
+    )
+
+
+def export_onnx_int8(model, output_dir: str):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    onnx_path = os.path.join(output_dir, MODEL_BACKENDS["onnx"])
+    if not os.path.exists(onnx_path):
+        export_onnx(model, output_dir)
+    quantize_dynamic(onnx_path, os.path.join(output_dir, MODEL_BACKENDS["onnx-int8"]), weight_type=QuantType.QInt8)
+
+
+EXPORTERS = {
+    "torch-int8": export_torch_int8,
+    "onnx": export_onnx,
+    "onnx-int8": export_onnx_int8,
+}
+
+
+def load_holdout(holdout_dir: str, label2id: dict, limit: int = None):
+    """Список (путь, id класса или None) из директорий с названиями классов"""
+    samples = []
+    for root, _, files in os.walk(holdout_dir):
+        label = label2id.get(os.path.basename(root))
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(root, name), label))
+    return samples[:limit] if limit else samples
+
+
+def load_service(model_dir: str, backend: str, processor) -> AIService:
+    service = AIService()
+    service.model_path = model_dir
+    service.backend = backend
+    service.config = ViTConfig.from_pretrained(model_dir)
+    service.model = service._load_backend(backend)
+    service.feature_extractor = processor
+    return service
+
+
+def run_backend(service: AIService, batches: list):
+    """Вероятности по всей выборке и среднее время инференса на изображение"""
+    probabilities, elapsed, count = [], 0.0, 0
+    for pixel_values in batches:
+        start = time.perf_counter()
+        logits, _ = service.forward(pixel_values)
+        elapsed += time.perf_counter() - start
+        count += len(pixel_values)
+        probabilities.append(torch.nn.functional.softmax(logits.float(), dim=-1))
+    return torch.cat(probabilities), elapsed / max(count, 1)
+
+
+def check_parity(model_dir: str, formats: list, samples: list, processor, batch_size: int, min_agreement: float) -> bool:
+    batches = []
+    for i in range(0, len(samples), batch_size):
+        images = [Image.open(path).convert("RGB") for path, _ in samples[i:i + batch_size]]
+        batches.append(processor(images=images, return_tensors="pt")["pixel_values"])
+    labels = torch.tensor([label if label is not None else -1 for _, label in samples])
+    labeled = labels >= 0
+
+    reference, reference_latency = run_backend(load_service(model_dir, "torch", processor), batches)
+    reference_top1 = reference.argmax(-1)
+
+    def accuracy(top1):
+        if not labeled.any():
+            return "-"
+        return f"{(top1[labeled] == labels[labeled]).float().mean().item():.4f}"
+
+    print(f"{'backend':<12} {'accuracy':>9} {'agreement':>10} {'max |dp|':>9} {'ms/img':>8}")
+    print(f"{'torch':<12} {accuracy(reference_top1):>9} {'1.0000':>10} {'0':>9} {reference_latency * 1000:>8.1f}")
+    passed = True
+    for backend in formats:
+        probabilities, latency = run_backend(load_service(model_dir, backend, processor), batches)
+        top1 = probabilities.argmax(-1)
+        agreement = (top1 == reference_top1).float().mean().item()
+        max_diff = (probabilities - reference).abs().max().item()
+        print(f"{backend:<12} {accuracy(top1):>9} {agreement:>10.4f} {max_diff:>9.4f} {latency * 1000:>8.1f}")
+        if agreement < min_agreement:
+            print(f"{backend}: совпадение с fp32 {agreement:.4f} ниже порога {min_agreement}")
+            passed = False
+    return passed
+
+
+def main():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Экспорт модели классификации растений для CPU-инференса")
+    parser.add_argument("--source", default=os.path.join(backend_dir, "plants_classification"),
+                        help="директория с fp32-моделью (save_pretrained)")
+    parser.add_argument("--output", default=os.path.join(backend_dir, "plants_classification"),
+                        help="куда сохранить артефакты (директория, из которой модель загружает сервис)")
+    parser.add_argument("--formats", nargs="+", default=list(EXPORTERS), choices=list(EXPORTERS))
+    parser.add_argument("--processor", default=VENDORED_PROCESSOR_PATH)
+    parser.add_argument("--holdout", help="отложенная выборка для проверки точности")
+    parser.add_argument("--limit", type=int, help="ограничить число изображений выборки")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    args = parser.parse_args()
+
+    model = ViTForImageClassification.from_pretrained(args.source).eval()
+    os.makedirs(args.output, exist_ok=True)
+    if os.path.abspath(args.source) != os.path.abspath(args.output):
+        # Бэкенду torch и остальным нужен конфиг (id2label) рядом с артефактами
+        model.save_pretrained(args.output)
+
+    for fmt in args.formats:
+        EXPORTERS[fmt](model, args.output)
+        print(f"{fmt}: экспортировано в {os.path.join(args.output, MODEL_BACKENDS[fmt])}")
+
+    if args.holdout:
+        processor = ViTImageProcessor.from_pretrained(args.processor)
+        samples = load_holdout(args.holdout, model.config.label2id, args.limit)
+        if not samples:
+            print(f"В {args.holdout} нет изображений")
+            sys.exit(1)
+        if not check_parity(args.output, args.formats, samples, processor, args.batch_size, args.min_agreement):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
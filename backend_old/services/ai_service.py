@@ -1,14 +1,44 @@
 # services/ai_service.py
 import os
-from transformers import ViTForImageClassification, ViTImageProcessor
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
 import torch
-from typing import Dict, Any
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Union, BinaryIO
 from PIL import Image
 from config.settings import get_settings
+from services.prediction_cache import PredictionCache
+from services.image_preprocessing import ImagePreprocessor, decode_image
+from services.model_weights import load_model_mmap, prepare_runtime_weights
 from enum import Enum
 
 settings = get_settings()
 
+# Бэкенд инференса -> файл модели в директории plants_classification (None - исходные fp32-веса)
+MODEL_BACKENDS = {
+    "torch": None,
+    "torch-int8": "model_int8.pt",
+    "onnx": "model.onnx",
+    "onnx-int8": "model_int8.onnx",
+}
+
+# Конфиг ViTImageProcessor модели google/vit-base-patch16-224-in21k, на которой дообучена модель,
+# хранится в репозитории, чтобы запуск не зависел от Hugging Face Hub
+VENDORED_PROCESSOR_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "vit_processor")
+
+class RawPrediction(NamedTuple):
+    """Выход модели для одного изображения: вероятности классов и эмбеддинг (CLS-токен ViT)"""
+    probabilities: torch.Tensor
+    embedding: Optional[torch.Tensor]
+
+class ModelNotReadyError(Exception):
+    """Модель еще загружается (или не загрузилась) - классификация временно недоступна"""
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Динамическая int8-квантизация линейных слоев (основная часть вычислений ViT)"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
 class Species(str, Enum):
     ALOE_VERA = "Aloe Vera"
     ARECA_PALM = "Areca Palm (Dypsis lutescens)"
@@ -23,66 +53,361 @@ class Species(str, Enum):
     SCHEFFLERA = "Schefflera"
     ZZ_PLANT = "ZZ Plant (Zamioculcas zamiifolia)"
 
+class InferenceBatcher:
+    """
+    Собирает одновременные запросы в микробатчи (не больше max_batch_size, ожидание первого
+    запроса не дольше max_wait_ms) и выполняет каждый батч одним вызовом predict_batch
+    в выделенном потоке, не блокируя event loop
+    """
+    def __init__(self, predict_batch, max_batch_size: int, max_wait_ms: float):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Батч, который собирается или выполняется сейчас
+        self._batch: list = []
+
+    def start(self):
+        if self._task is None:
+            # Один поток инференса: параллелизм дает батч и внутренние потоки torch
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает сборщик батчей; ожидающие запросы (в очереди и в текущем батче) завершаются ошибкой"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            pending = self._batch
+            self._batch = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(ModelNotReadyError("Сервис останавливается"))
+            self._executor.shutdown(wait=True)
+
+    async def submit(self, item) -> Any:
+        """Ставит item в очередь и ждет результат его батча"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> list:
+        # Собирается прямо в self._batch: при остановке stop() завершит и уже забранные из очереди запросы
+        batch = self._batch = []
+        batch.append(await self._queue.get())
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Пока выполняется предыдущий батч, очередь успевает наполниться - забираем без ожидания
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Клиенты, которые уже отключились, в батч не попадают
+        self._batch = [(item, future) for item, future in batch if not future.cancelled()]
+        return self._batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(self._executor, self.predict_batch, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
 class AIService:
     def __init__(self):
         self.model = None
+        self.config = None
         self.feature_extractor = None
+        self.preprocessor = None
+        # loading -> ready | failed; классификация доступна только в состоянии ready
+        self.state = "loading"
+        self.load_error: Optional[str] = None
+        self._load_task: Optional[asyncio.Task] = None
+        self.backend = settings.AI_BACKEND
         # Путь к директории с моделью относительно корня проекта
-        self.model_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "plants_classification")
+        self.model_path = settings.AI_MODEL_PATH or os.path.join(os.path.dirname(os.path.dirname(__file__)), "plants_classification")
+        self.labels: List[str] = []
+        self.batcher = InferenceBatcher(self.infer_batch, settings.AI_MAX_BATCH_SIZE, settings.AI_MAX_BATCH_WAIT_MS)
+        self.cache = PredictionCache(
+            settings.AI_CACHE_SIZE,
+            settings.AI_CACHE_TTL_SECONDS,
+            settings.AI_CACHE_PHASH_DISTANCE if settings.AI_CACHE_PHASH_DISTANCE >= 0 else None
+        )
+        # Скользящее среднее времени инференса одного изображения - цена промаха кеша
+        self.seconds_per_image = 0.0
+        # Одновременные запросы с одинаковым изображением ждут один проход модели
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def _load_backend(self, backend: str):
+        """Загружает модель выбранного бэкенда (экспорт - scripts/export_model.py)"""
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд модели: {backend}")
+        if backend == "torch":
+            if settings.AI_MMAP_WEIGHTS:
+                try:
+                    weights_path = prepare_runtime_weights(ViTForImageClassification, self.model_path, settings.AI_WEIGHTS_CACHE_DIR)
+                except OSError as e:
+                    # Например, директория кеша недоступна для записи
+                    print(f"Не удалось подготовить веса для mmap, модель загружается целиком: {e}")
+                else:
+                    # Веса читаются из общего для всех воркеров page cache, а не копируются в память процесса
+                    return load_model_mmap(ViTForImageClassification, self.config, weights_path)
+            return ViTForImageClassification.from_pretrained(self.model_path).eval()
+        artifact = os.path.join(self.model_path, MODEL_BACKENDS[backend])
+        if backend == "torch-int8":
+            # Структура квантизованной модели строится из конфига, веса - из экспортированного state_dict
+            model = quantize_int8(ViTForImageClassification(self.config).eval())
+            model.load_state_dict(torch.load(artifact, map_location="cpu"))
+            return model
+        import onnxruntime
+        return onnxruntime.InferenceSession(artifact, providers=["CPUExecutionProvider"])
         
+    def _processor_path(self) -> str:
+        """Конфиг процессора рядом с моделью, если он там есть, иначе - из репозитория"""
+        if os.path.exists(os.path.join(self.model_path, "preprocessor_config.json")):
+            return self.model_path
+        return VENDORED_PROCESSOR_PATH
+
+    def _warm_up(self):
+        """Пробный проход: первый реальный запрос не платит за ленивую инициализацию torch/ONNX Runtime"""
+        size = self.config.image_size
+        self.forward(torch.zeros(1, self.config.num_channels, size, size))
+
     def load_model(self):
         """Загрузка модели и токенизатора"""
+        self.state = "loading"
         try:
             # Загружаем модель из локальной директории
-            self.model = ViTForImageClassification.from_pretrained(self.model_path)
-            self.feature_extractor = ViTImageProcessor.from_pretrained(
-                'google/vit-base-patch16-224-in21k'
-            )
+            self.config = ViTConfig.from_pretrained(self.model_path)
+            self.labels = [self.config.id2label[idx] for idx in range(len(self.config.id2label))]
+            self.model = self._load_backend(self.backend)
+            self.feature_extractor = ViTImageProcessor.from_pretrained(self._processor_path())
+            if settings.AI_FAST_PREPROCESSING:
+                self.preprocessor = ImagePreprocessor.from_processor(self.feature_extractor)
+            self._warm_up()
             
-            print(f"Модель успешно загружена из {self.model_path}")
+            self.state = "ready"
+            print(f"Модель ({self.backend}) успешно загружена из {self.model_path}")
             return True
         except Exception as e:
+            self.state = "failed"
+            self.load_error = str(e)
             print(f"Ошибка при загрузке модели: {str(e)}")
             return False
-    
-    def predict(self, image_path: str) -> Dict[str, Any]:
-        """Получение предсказания от модели"""
-        if not self.model or not self.feature_extractor:
-            raise ValueError("Модель не загружена")
-        
-        image = Image.open(image_path)
-        inputs = self.feature_extractor(images=image, return_tensors="pt")
-        
+
+    def start_loading(self):
+        """Загружает модель в фоне, не блокируя запуск приложения и остальные маршруты"""
+        if self._load_task is None:
+            self._load_task = asyncio.create_task(asyncio.to_thread(self.load_model))
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def forward(self, pixel_values: torch.Tensor) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+        """
+        Логиты и эмбеддинги (CLS-токен последнего слоя, вход классификатора) для батча изображений
+        за один проход независимо от бэкенда
+        """
+        if self.backend.startswith("onnx"):
+            names = [output.name for output in self.model.get_outputs()]
+            outputs = dict(zip(names, self.model.run(None, {"pixel_values": pixel_values.numpy()})))
+            # Модели, экспортированные без выхода embedding, отдают только логиты
+            embedding = outputs.get("embedding")
+            return torch.from_numpy(outputs["logits"]), torch.from_numpy(embedding) if embedding is not None else None
         with torch.no_grad():
-            outputs = self.model(**inputs)
+            embeddings = self.model.vit(pixel_values=pixel_values).last_hidden_state[:, 0, :]
+            return self.model.classifier(embeddings), embeddings
+    
+    def _format_prediction(self, prediction: RawPrediction, top_k: Optional[int] = None, with_embedding: bool = False) -> Dict[str, Any]:
+        """
+        Ответ для одного изображения. Порог "Not found" и выбор top_k классов считаются на тензоре,
+        в Python-словарь попадают только возвращаемые классы
+        """
+        probabilities = prediction.probabilities
+        confidence, predicted_class_idx = probabilities.max(-1)
+        # Класс найден, если его вероятность не меньше половины суммы вероятностей
+        found = bool(confidence >= probabilities.sum() * 0.5)
 
-        # Получение предсказаний
-        logits = outputs.logits
-        predicted_class_idx = logits.argmax(-1).item()
-        
-        # Получаем вероятности для всех классов
-        probabilities = torch.nn.functional.softmax(logits, dim=-1)[0]
-        
-        # Создаем словарь с вероятностями для каждого класса
-        class_probabilities = {}
-        for idx, prob in enumerate(probabilities):
-            class_name = self.model.config.id2label[idx]
-            class_probabilities[class_name] = round(float(prob), 4)
-        
-        # Получаем название предсказанного класса и его вероятность
-        predicted_class = self.model.config.id2label[predicted_class_idx]
-        confidence = class_probabilities[predicted_class]
-        if confidence < sum(class_probabilities.values()) * 0.5:
-            predicted_class = "Not found"
+        if top_k:
+            values, indices = torch.topk(probabilities, min(top_k, probabilities.numel()))
+            labels = [self.labels[idx] for idx in indices.tolist()]
+        else:
+            values, labels = probabilities, self.labels
 
         # Формируем результат
         result = {
-            "predicted_class": predicted_class,
-            "confidence": confidence,
-            "probabilities": class_probabilities
+            "predicted_class": self.labels[int(predicted_class_idx)] if found else "Not found",
+            "confidence": round(float(confidence), 4),
+            "probabilities": dict(zip(labels, torch.round(values.double(), decimals=4).tolist()))
         }
-        
+        if with_embedding:
+            if prediction.embedding is None:
+                raise ValueError("Модель экспортирована без выхода embedding - переэкспортируйте ее scripts/export_model.py")
+            result["embedding"] = prediction.embedding.tolist()
         return result
 
+    def load_image(self, source: Union[bytes, BinaryIO, Image.Image, str]) -> Image.Image:
+        """
+        Декодирует изображение из памяти: байты, файловый объект (например, загрузка) или готовое
+        PIL-изображение; путь к файлу тоже поддерживается
+        """
+        draft_size = self.preprocessor.size if self.preprocessor is not None and settings.AI_JPEG_DRAFT else None
+        return decode_image(source, draft_size)
+
+    def infer_batch(self, images: List[Union[bytes, BinaryIO, Image.Image, str]]) -> List[RawPrediction]:
+        """Выход модели для нескольких изображений за один проход"""
+        if not self.model or not self.feature_extractor:
+            raise ValueError("Модель не загружена")
+
+        start = time.perf_counter()
+        images = [self.load_image(image) for image in images]
+        if self.preprocessor is not None:
+            pixel_values = self.preprocessor(images)
+        else:
+            pixel_values = self.feature_extractor(images=images, return_tensors="pt")["pixel_values"]
+        logits, embeddings = self.forward(pixel_values)
+
+        # Получаем вероятности для всех классов
+        probabilities = torch.nn.functional.softmax(logits, dim=-1)
+        results = [
+            RawPrediction(probabilities[idx], embeddings[idx].clone() if embeddings is not None else None)
+            for idx in range(len(images))
+        ]
+
+        per_image = (time.perf_counter() - start) / len(images)
+        self.seconds_per_image = per_image if not self.seconds_per_image else 0.9 * self.seconds_per_image + 0.1 * per_image
+        return results
+
+    def predict_batch(self, images: List[Union[bytes, BinaryIO, Image.Image, str]], top_k: Optional[int] = None,
+                      with_embedding: bool = False) -> List[Dict[str, Any]]:
+        """Предсказания для нескольких изображений за один проход модели"""
+        return [self._format_prediction(prediction, top_k, with_embedding) for prediction in self.infer_batch(images)]
+    
+    def predict(self, image: Union[bytes, BinaryIO, Image.Image, str], top_k: Optional[int] = None,
+                with_embedding: bool = False) -> Dict[str, Any]:
+        """Получение предсказания от модели (повторное изображение берется из кеша)"""
+        image = self.load_image(image)
+        key, phash = self.cache.keys(image)
+        prediction = self.cache.get(key, phash, self.seconds_per_image)
+        if prediction is None:
+            prediction = self.infer_batch([image])[0]
+            self.cache.set(key, prediction, phash)
+        return self._format_prediction(prediction, top_k, with_embedding)
+
+    def _prepare(self, source) -> tuple:
+        image = self.load_image(source)
+        return (image, *self.cache.keys(image))
+
+    async def _classify_uncached(self, key: str, phash, image: Image.Image) -> RawPrediction:
+        try:
+            prediction = await self.batcher.submit(image)
+            self.cache.set(key, prediction, phash)
+            return prediction
+        finally:
+            self._pending.pop(key, None)
+
+    async def _infer(self, image: Union[bytes, BinaryIO, Image.Image, str]) -> RawPrediction:
+        """
+        Асинхронный выход модели: запрос попадает в микробатч вместе с одновременными запросами.
+        Изображение декодируется заранее вне потока модели, поэтому битый файл не ломает весь батч.
+        Повторно присланное изображение берется из кеша без прохода модели
+        """
+        if not self.ready:
+            raise ModelNotReadyError("Модель еще не загружена" if self.state == "loading" else "Модель не загружена")
+        return await self._infer_prepared(*await asyncio.to_thread(self._prepare, image))
+
+    async def _infer_prepared(self, image: Image.Image, key: str, phash) -> RawPrediction:
+        prediction = self.cache.get(key, phash, self.seconds_per_image)
+        if prediction is None:
+            task = self._pending.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._classify_uncached(key, phash, image))
+                self._pending[key] = task
+            # shield: отключение одного клиента не отменяет проход модели для остальных
+            prediction = await asyncio.shield(task)
+        return prediction
+
+    async def classify(self, image: Union[bytes, BinaryIO, Image.Image, str], top_k: Optional[int] = None,
+                       with_embedding: bool = False) -> Dict[str, Any]:
+        """
+        Асинхронное предсказание (см. _infer).
+        top_k - вернуть только k самых вероятных классов, with_embedding - добавить эмбеддинг изображения
+        """
+        return self._format_prediction(await self._infer(image), top_k, with_embedding)
+
+    async def classify_many(self, images: List[Union[bytes, BinaryIO, Image.Image, str]], top_k: Optional[int] = None,
+                            with_embedding: bool = False) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Асинхронные предсказания для нескольких изображений (например, из очереди фоновой классификации).
+        Все изображения декодируются одним вызовом и передаются батчеру одновременно, поэтому
+        попадают в один проход модели. Для битого изображения вместо результата возвращается исключение
+        """
+        if not self.ready:
+            raise ModelNotReadyError("Модель еще не загружена" if self.state == "loading" else "Модель не загружена")
+
+        def prepare_all() -> list:
+            prepared = []
+            for image in images:
+                try:
+                    prepared.append(self._prepare(image))
+                except Exception as e:
+                    prepared.append(e)
+            return prepared
+
+        async def classify_prepared(prepared) -> Dict[str, Any]:
+            if isinstance(prepared, Exception):
+                raise prepared
+            return self._format_prediction(await self._infer_prepared(*prepared), top_k, with_embedding)
+
+        prepared = await asyncio.to_thread(prepare_all)
+        return await asyncio.gather(*(classify_prepared(item) for item in prepared), return_exceptions=True)
+
+    async def embed(self, image: Union[bytes, BinaryIO, Image.Image, str]) -> torch.Tensor:
+        """Эмбеддинг изображения (CLS-токен ViT) для поиска похожих растений"""
+        prediction = await self._infer(image)
+        if prediction.embedding is None:
+            raise ValueError("Модель экспортирована без выхода embedding - переэкспортируйте ее scripts/export_model.py")
+        return prediction.embedding
+
+    async def wait_loaded(self):
+        """Дождаться окончания фоновой загрузки модели (успешной или нет)"""
+        if self._load_task is not None:
+            await asyncio.shield(self._load_task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "backend": self.backend,
+            "seconds_per_image": round(self.seconds_per_image, 4),
+            "cache": self.cache.stats(),
+        }
+
 # Создаем синглтон для сервиса модели
 ai_service = AIService()
\ No newline at end of file
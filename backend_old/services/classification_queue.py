@@ -0,0 +1,105 @@
+# services/classification_queue.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Union
+
+from config.settings import get_settings
+from services.ai_service import ai_service
+
+settings = get_settings()
+
+class ClassificationJob(NamedTuple):
+    """Классификация изображения растения; image_path - изображение на момент постановки в очередь"""
+    plant_id: int
+    image_path: str
+
+# Обработчик результата: результат classify() (с эмбеддингом) или исключение
+ResultHandler = Callable[[ClassificationJob, Union[Dict[str, Any], Exception]], Awaitable[None]]
+
+class ClassificationQueue:
+    """
+    Очередь фоновой классификации изображений растений в памяти процесса.
+    Воркеры забирают из очереди сразу несколько заданий и отправляют их в модель одновременно
+    (AIService.classify_many), поэтому они попадают в один микробатч InferenceBatcher. Очередь не переживает перезапуск:
+    незавершенные задания забираются из базы при запуске (services/plant_classification.py)
+    """
+    def __init__(self, workers: int, batch_size: int):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[ResultHandler] = None
+        # Пачки, которые воркеры обрабатывают сейчас
+        self._active: Dict[int, List[ClassificationJob]] = {}
+        self.processed = 0
+        self.failed = 0
+
+    def start(self, handler: ResultHandler):
+        if not self._tasks:
+            self._handler = handler
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._run(worker)) for worker in range(self.workers)]
+
+    async def stop(self) -> List[ClassificationJob]:
+        """Останавливает воркеры; возвращает задания, которые не успели обработать"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        unfinished = [job for batch in self._active.values() for job in batch]
+        self._active = {}
+        while self._queue is not None and not self._queue.empty():
+            unfinished.append(self._queue.get_nowait())
+        return unfinished
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def enqueue(self, plant_id: int, image_path: str):
+        """Поставить изображение растения в очередь (не ждет классификации)"""
+        if self._queue is None:
+            raise RuntimeError("Очередь классификации не запущена")
+        self._queue.put_nowait(ClassificationJob(plant_id, image_path))
+
+    async def _collect(self) -> List[ClassificationJob]:
+        batch = [await self._queue.get()]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self, worker: int):
+        # Задания ждут в очереди, пока модель загружается; если загрузка не удалась,
+        # все задания (и уже поставленные, и новые) завершаются ошибкой, а не висят в очереди
+        await ai_service.wait_loaded()
+        load_error = None if ai_service.ready else RuntimeError(f"Модель не загружена: {ai_service.load_error}")
+        while True:
+            self._active.pop(worker, None)
+            batch = self._active[worker] = await self._collect()
+            if load_error is not None:
+                results = [load_error] * len(batch)
+            else:
+                try:
+                    results = await ai_service.classify_many([job.image_path for job in batch], with_embedding=True)
+                except Exception as e:
+                    results = [e] * len(batch)
+            for job, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.failed += 1
+                    print(f"Ошибка при классификации изображения растения {job.plant_id}: {result}")
+                else:
+                    self.processed += 1
+                try:
+                    await self._handler(job, result)
+                except Exception as e:
+                    print(f"Не удалось сохранить результат классификации растения {job.plant_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+# Создаем синглтон очереди
+classification_queue = ClassificationQueue(settings.AI_CLASSIFICATION_WORKERS, settings.AI_MAX_BATCH_SIZE)
@@ -0,0 +1,65 @@
+# services/image_preprocessing.py
+from io import BytesIO
+from typing import BinaryIO, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+from PIL import Image
+
+def decode_image(source: Union[bytes, BinaryIO, Image.Image, str], draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    Декодирует изображение в RGB. Если задан draft_size, JPEG сразу декодируется в уменьшенном
+    масштабе (1/2, 1/4, 1/8), но не меньше draft_size - полный кадр фотографии с камеры не распаковывается
+    """
+    if isinstance(source, Image.Image):
+        image = source
+    else:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = BytesIO(source)
+        image = Image.open(source)
+        if draft_size is not None:
+            image.draft("RGB", draft_size)
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    # Декодируем сразу, пока источник (например, файл загрузки) открыт
+    image.load()
+    return image
+
+class ImagePreprocessor:
+    """
+    Подготовка батча изображений для ViT: resize средствами Pillow, затем rescale и normalize
+    одной векторной операцией NumPy над всем батчем (вместо поэлементной обработки ViTImageProcessor)
+    """
+    def __init__(self, size: Tuple[int, int], resample: int, rescale_factor: float,
+                 image_mean: Sequence[float], image_std: Sequence[float], do_resize: bool = True):
+        self.size = size
+        self.resample = resample
+        self.do_resize = do_resize
+        mean = np.asarray(image_mean, dtype=np.float32)
+        std = np.asarray(image_std, dtype=np.float32)
+        # (x * rescale - mean) / std == x * scale + shift
+        self.scale = (np.float32(rescale_factor) / std).astype(np.float32)
+        self.shift = (-mean / std).astype(np.float32)
+
+    @classmethod
+    def from_processor(cls, processor) -> "ImagePreprocessor":
+        """Параметры берутся из ViTImageProcessor, с которым обучалась модель"""
+        rescale_factor = processor.rescale_factor if processor.do_rescale else 1.0
+        image_mean = processor.image_mean if processor.do_normalize else [0.0, 0.0, 0.0]
+        image_std = processor.image_std if processor.do_normalize else [1.0, 1.0, 1.0]
+        return cls(
+            size=(processor.size["width"], processor.size["height"]),
+            resample=int(processor.resample),
+            rescale_factor=rescale_factor,
+            image_mean=image_mean,
+            image_std=image_std,
+            do_resize=processor.do_resize
+        )
+
+    def __call__(self, images: List[Image.Image]) -> torch.Tensor:
+        """pixel_values (N, 3, H, W) float32 для батча RGB-изображений"""
+        if self.do_resize:
+            images = [image if image.size == self.size else image.resize(self.size, self.resample) for image in images]
+        batch = np.stack([np.asarray(image, dtype=np.uint8) for image in images])
+        pixel_values = batch.astype(np.float32) * self.scale + self.shift
+        return torch.from_numpy(np.ascontiguousarray(pixel_values.transpose(0, 3, 1, 2)))
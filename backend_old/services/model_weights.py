@@ -0,0 +1,120 @@
+# services/model_weights.py
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: без блокировки воркеры могут подготовить файл параллельно, запись все равно атомарна
+    fcntl = None
+
+import torch
+import transformers
+from safetensors.torch import save_file
+
+# Типы данных safetensors -> torch
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+def load_safetensors_mmap(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Открывает веса safetensors без копирования: тензоры ссылаются на отображенный в память файл.
+    Страницы файла лежат в page cache и общие для всех процессов (воркеров uvicorn), загрузивших
+    ту же модель; отображение copy-on-write, поэтому запись в тензор не меняет файл на диске
+    """
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        count = (end - start) // dtype.itemsize
+        if count == 0:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + start).view(info["shape"])
+    return tensors
+
+# Файлы директории модели, от которых зависят подготовленные веса
+_SOURCE_FILES = ("config.json", "model.safetensors", "pytorch_model.bin")
+
+def _source_version(model_path: str) -> str:
+    """Ключ исходной модели: путь и размер/время изменения ее файлов - обновленная модель получит новый файл"""
+    digest = hashlib.sha256(os.path.realpath(model_path).encode())
+    for name in _SOURCE_FILES:
+        path = os.path.join(model_path, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+@contextmanager
+def _file_lock(path: str):
+    """Эксклюзивная блокировка между процессами (воркерами uvicorn) на время подготовки файла"""
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def prepare_runtime_weights(model_class, model_path: str, cache_dir: str) -> str:
+    """
+    Файл весов с именами параметров той версии transformers, которая установлена
+    (from_pretrained переименовывает ключи старых чекпойнтов при загрузке, а load_state_dict - нет).
+    Создается один раз в cache_dir (директория модели не меняется и может быть только на чтение):
+    первый воркер готовит файл под блокировкой и атомарно переименовывает временный файл,
+    остальные ждут блокировку и используют готовый
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"model-{_source_version(model_path)}.runtime-{transformers.__version__}.safetensors")
+    if os.path.exists(path):
+        return path
+    with _file_lock(f"{path}.lock"):
+        if os.path.exists(path):
+            return path
+        model = model_class.from_pretrained(model_path)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            save_file({name: tensor.contiguous() for name, tensor in model.state_dict().items()}, tmp_path, metadata={"format": "pt"})
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
+
+def load_model_mmap(model_class, config, weights_path: str) -> torch.nn.Module:
+    """
+    Создает модель без выделения памяти под веса (meta-устройство) и подставляет в нее
+    тензоры из отображенного файла, не копируя их
+    """
+    with torch.device("meta"):
+        model = model_class(config)
+    model.load_state_dict(load_safetensors_mmap(weights_path), strict=True, assign=True)
+    if any(tensor.is_meta for tensor in (*model.parameters(), *model.buffers())):
+        raise ValueError(f"В {weights_path} есть не все веса модели")
+    return model.eval()
@@ -0,0 +1,104 @@
+# services/plant_classification.py
+import asyncio
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from config.settings import get_settings
+from database import SessionLocal
+from models.plant import Plant
+from services.classification_queue import classification_queue, ClassificationJob
+from services.similarity_index import similarity_index, embedding_to_bytes
+
+settings = get_settings()
+
+def claim_classifications(db: Session, plant_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, str]]:
+    """
+    Забирает растения, ожидающие фоновой классификации: пары (id, путь к изображению).
+    Статус running ставится одним UPDATE ... RETURNING, поэтому при запуске нескольких воркеров uvicorn
+    каждое задание достается одному из них. Задания в статусе running с истекшей арендой
+    (воркер, забравший их, остановился) забираются заново
+    """
+    expired = func.now() - timedelta(seconds=settings.AI_CLASSIFICATION_LEASE_SECONDS)
+    statement = update(Plant).where(
+        or_(
+            Plant.classification_status == "pending",
+            and_(Plant.classification_status == "running", Plant.classification_claimed_at < expired)
+        ),
+        Plant.image_path.isnot(None)
+    )
+    if plant_ids is not None:
+        statement = statement.where(Plant.id.in_(list(plant_ids)))
+    statement = statement.values(
+        classification_status="running", classification_claimed_at=func.now()
+    ).returning(Plant.id, Plant.image_path)
+    rows = db.execute(statement.execution_options(synchronize_session=False)).all()
+    db.commit()
+    return [(plant_id, image_path) for plant_id, image_path in rows]
+
+def enqueue_plant_image(db: Session, plant: Plant):
+    """
+    Ставит изображение растения в очередь фоновой классификации (ответ не ждет модель): эмбеддинг
+    и вид, если растение ждет классификации, посчитают воркеры очереди этого процесса
+    """
+    plant_id, image_path = plant.id, plant.image_path
+    claim_classifications(db, [plant_id])
+    classification_queue.enqueue(plant_id, image_path)
+
+def start_background_classification():
+    """Запускает воркеры очереди и забирает задания, не завершенные до перезапуска"""
+    classification_queue.start(store_classification)
+    db = SessionLocal()
+    try:
+        for plant_id, image_path in claim_classifications(db):
+            classification_queue.enqueue(plant_id, image_path)
+    finally:
+        db.close()
+
+async def stop_background_classification():
+    """
+    Останавливает воркеры очереди; необработанные задания этого процесса возвращаются в pending,
+    чтобы их сразу забрал следующий запущенный воркер, не дожидаясь истечения аренды
+    """
+    plant_ids = [job.plant_id for job in await classification_queue.stop()]
+    if not plant_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Plant).where(Plant.id.in_(plant_ids), Plant.classification_status == "running")
+            .values(classification_status="pending", classification_claimed_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+async def store_classification(job: ClassificationJob, result: Union[Dict[str, Any], Exception]):
+    """Сохранить результат фоновой классификации (обработчик очереди классификации)"""
+    await asyncio.to_thread(_store_classification, job, result)
+
+def _store_classification(job: ClassificationJob, result: Union[Dict[str, Any], Exception]):
+    db = SessionLocal()
+    try:
+        plant = db.query(Plant).filter(Plant.id == job.plant_id).first()
+        # Растение удалено или изображение заменено - результат для нового изображения придет следующим заданием
+        if not plant or plant.image_path != job.image_path:
+            return
+
+        failed = isinstance(result, Exception)
+        if plant.classification_status == "running":
+            # Вид, указанный пользователем, пока шла классификация, не перезаписываем
+            if not failed and not plant.species and result["predicted_class"] != "Not found":
+                plant.species = result["predicted_class"]
+            plant.classification_status = "failed" if failed else "done"
+        if not failed:
+            plant.embedding = embedding_to_bytes(result["embedding"])
+        db.commit()
+        if not failed:
+            similarity_index.add(plant.user_id, plant.id, plant.image_path, result["embedding"])
+    finally:
+        db.close()
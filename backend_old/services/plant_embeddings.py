@@ -0,0 +1,87 @@
+# services/plant_embeddings.py
+import asyncio
+import os
+from typing import List, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from config.settings import get_settings
+from models.plant import Plant
+from services.ai_service import ai_service
+from services.plant_classification import enqueue_plant_image
+from services.similarity_index import similarity_index, embedding_to_bytes, embedding_from_bytes
+
+settings = get_settings()
+
+async def update_embedding(db: Session, plant: Plant) -> bool:
+    """
+    Посчитать эмбеддинг изображения растения, сохранить его и добавить в индекс похожих.
+    False - изображение заменили или растение удалили, пока шел инференс: эмбеддинг не сохраняется
+    """
+    image_path = plant.image_path
+    embedding = (await ai_service.embed(image_path)).numpy()
+    # Строка блокируется до коммита, путь к изображению перечитывается: эмбеддинг старого изображения
+    # не должен попасть в строку с новым (backfill досчитывает только пустые эмбеддинги)
+    current = db.query(Plant).filter(Plant.id == plant.id).with_for_update().populate_existing().first()
+    if current is None or current.image_path != image_path:
+        db.rollback()
+        return False
+    current.embedding = embedding_to_bytes(embedding)
+    db.commit()
+    similarity_index.add(current.user_id, current.id, image_path, embedding)
+    return True
+
+async def index_plant_image(db: Session, plant: Plant):
+    """
+    После загрузки изображения: эмбеддинг прежнего изображения убирается из индекса, новый считается
+    сразу, если модель готова (иначе его досчитает backfill_embeddings). В режиме фоновой
+    классификации изображение ставится в очередь
+    """
+    similarity_index.remove(plant.id)
+    if settings.AI_BACKGROUND_CLASSIFICATION:
+        enqueue_plant_image(db, plant)
+        return
+    if not ai_service.ready:
+        return
+    try:
+        await update_embedding(db, plant)
+    except Exception as e:
+        print(f"Не удалось посчитать эмбеддинг изображения растения {plant.id}: {e}")
+
+async def backfill_embeddings(db: Session, batch_size: int = 8) -> int:
+    """Досчитать эмбеддинги изображений, загруженных до появления поиска или пока модель загружалась"""
+    # Растения в очереди фоновой классификации получат эмбеддинг от ее воркеров
+    plants = db.query(Plant).filter(
+        Plant.image_path.isnot(None), Plant.embedding.is_(None),
+        or_(Plant.classification_status.is_(None), Plant.classification_status.notin_(["pending", "running"]))
+    ).all()
+    plants = [plant for plant in plants if os.path.exists(plant.image_path)]
+    # Пачками: одновременные запросы попадают в один микробатч модели
+    for start in range(0, len(plants), batch_size):
+        batch = plants[start:start + batch_size]
+        results = await asyncio.gather(*(update_embedding(db, plant) for plant in batch), return_exceptions=True)
+        for plant, result in zip(batch, results):
+            if isinstance(result, Exception):
+                print(f"Не удалось посчитать эмбеддинг изображения растения {plant.id}: {result}")
+    return len(plants)
+
+def get_similar(db: Session, plant: Plant, limit: int) -> List[Tuple[Plant, float]]:
+    """
+    Растения владельца, изображения которых больше всего похожи на изображение растения plant:
+    пары (растение, косинусная близость эмбеддингов) по убыванию близости
+    """
+    # Индекс сверяется с базой по (id, путь к изображению): растения, созданные, измененные
+    # или удаленные другим воркером, подгружаются без полного пересчета
+    versions = db.query(Plant.id, Plant.image_path).filter(
+        Plant.user_id == plant.user_id, Plant.embedding.isnot(None)
+    ).all()
+    stale = similarity_index.sync(plant.user_id, versions)
+    if stale:
+        rows = db.query(Plant.id, Plant.image_path, Plant.embedding).filter(Plant.id.in_(stale)).all()
+        for plant_id, image_path, embedding in rows:
+            similarity_index.add(plant.user_id, plant_id, image_path, embedding_from_bytes(embedding))
+
+    matches = similarity_index.search(plant.user_id, plant.id, limit)
+    plants = {similar.id: similar for similar in Plant.get_by_ids(db, [plant_id for plant_id, _ in matches])}
+    return [(plants[plant_id], score) for plant_id, score in matches if plant_id in plants]
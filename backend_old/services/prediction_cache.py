@@ -0,0 +1,98 @@
+# services/prediction_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+def content_hash(image: Image.Image) -> str:
+    """Хеш декодированного изображения: одинаковые пиксели дают один ключ независимо от формата файла"""
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    64-битный dHash: знаки разностей соседних пикселей уменьшенной до 9x8 серой копии.
+    Пересжатие, небольшое изменение размера или яркости меняют лишь несколько битов
+    """
+    small = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+class PredictionCache:
+    """
+    LRU-кеш выходов модели (RawPrediction) с TTL.
+    Ключ - хеш содержимого; если задан max_distance, совпадением считается и изображение
+    с близким перцептивным хешем (расстояние Хэмминга не больше max_distance)
+    """
+    def __init__(self, max_size: int, ttl: float, max_distance: Optional[int] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        # ключ -> (перцептивный хеш, результат, время истечения)
+        self._entries: "OrderedDict[str, Tuple[Optional[int], Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def keys(self, image: Image.Image) -> Tuple[str, Optional[int]]:
+        return content_hash(image), perceptual_hash(image) if self.max_distance is not None else None
+
+    def get(self, key: str, phash: Optional[int] = None, cost: float = 0.0) -> Optional[Any]:
+        """Результат из кеша или None; cost - сколько стоил бы проход модели (для статистики)"""
+        if self.max_size <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += cost
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            if phash is not None:
+                for other_key, (other_phash, result, expires_at) in reversed(self._entries.items()):
+                    if other_phash is not None and expires_at > now and bin(phash ^ other_phash).count("1") <= self.max_distance:
+                        self._entries.move_to_end(other_key)
+                        self.near_hits += 1
+                        self.saved_seconds += cost
+                        return result
+            self.misses += 1
+            return None
+
+    def set(self, key: str, result: Any, phash: Optional[int] = None):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (phash, result, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
@@ -0,0 +1,124 @@
+# services/similarity_index.py
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+def normalize_embedding(embedding) -> np.ndarray:
+    """float32-вектор единичной длины: косинусная близость сводится к скалярному произведению"""
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def embedding_to_bytes(embedding) -> bytes:
+    return normalize_embedding(embedding).tobytes()
+
+def embedding_from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32)
+
+class _UserVectors:
+    """Эмбеддинги растений одного пользователя: строки матрицы с запасом емкости"""
+    def __init__(self, dim: int):
+        self.vectors = np.empty((8, dim), dtype=np.float32)
+        self.ids: List[int] = []
+        self.rows: Dict[int, int] = {}
+        # plant_id -> путь к изображению, по которому посчитан эмбеддинг
+        self.versions: Dict[int, Optional[str]] = {}
+
+    def add(self, plant_id: int, version: Optional[str], vector: np.ndarray):
+        row = self.rows.get(plant_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.vectors):
+                # Удвоение емкости: добавление в среднем O(1)
+                self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+            self.ids.append(plant_id)
+            self.rows[plant_id] = row
+        self.vectors[row] = vector
+        self.versions[plant_id] = version
+
+    def remove(self, plant_id: int):
+        row = self.rows.pop(plant_id, None)
+        if row is None:
+            return
+        del self.versions[plant_id]
+        # На место удаленной строки переносится последняя
+        last_id = self.ids.pop()
+        if last_id != plant_id:
+            self.vectors[row] = self.vectors[len(self.ids)]
+            self.ids[row] = last_id
+            self.rows[last_id] = row
+
+class SimilarityIndex:
+    """
+    Векторный индекс эмбеддингов изображений растений в памяти процесса, разбитый по пользователям:
+    поиск похожих идет только среди растений владельца. Обновляется инкрементально при загрузке
+    и удалении изображений; у одного пользователя десятки-сотни растений, поэтому точный поиск
+    перемножением матрицы на вектор занимает доли миллисекунды и приближенный индекс не нужен
+    """
+    def __init__(self):
+        self._users: Dict[int, _UserVectors] = {}
+        self._owners: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id: int, plant_id: int, version: Optional[str], embedding):
+        vector = normalize_embedding(embedding)
+        with self._lock:
+            owner = self._owners.get(plant_id)
+            if owner is not None and owner != user_id:
+                self._users[owner].remove(plant_id)
+            vectors = self._users.get(user_id)
+            if vectors is None or vectors.vectors.shape[1] != vector.shape[0]:
+                # Новый пользователь или модель с другой размерностью эмбеддинга
+                vectors = self._users[user_id] = _UserVectors(vector.shape[0])
+            vectors.add(plant_id, version, vector)
+            self._owners[plant_id] = user_id
+
+    def remove(self, plant_id: int):
+        with self._lock:
+            owner = self._owners.pop(plant_id, None)
+            if owner is not None:
+                self._users[owner].remove(plant_id)
+
+    def sync(self, user_id: int, versions: Iterable[Tuple[int, Optional[str]]]) -> List[int]:
+        """
+        Сверяет индекс пользователя с базой (пары plant_id, путь к изображению): лишние растения
+        удаляются, а возвращаются ID, эмбеддинги которых нужно (пере)загрузить - например,
+        растения, созданные или измененные другим воркером
+        """
+        versions = dict(versions)
+        with self._lock:
+            vectors = self._users.get(user_id)
+            indexed = vectors.versions if vectors is not None else {}
+            for plant_id in [plant_id for plant_id in indexed if plant_id not in versions]:
+                vectors.remove(plant_id)
+                self._owners.pop(plant_id, None)
+            return [plant_id for plant_id, version in versions.items()
+                    if plant_id not in indexed or indexed[plant_id] != version]
+
+    def search(self, user_id: int, plant_id: int, limit: int) -> List[Tuple[int, float]]:
+        """limit растений пользователя, ближайших к растению plant_id: пары (plant_id, косинусная близость)"""
+        with self._lock:
+            vectors = self._users.get(user_id)
+            if vectors is None or plant_id not in vectors.rows:
+                return []
+            count = len(vectors.ids)
+            row = vectors.rows[plant_id]
+            scores = vectors.vectors[:count] @ vectors.vectors[row]
+            ids = list(vectors.ids)
+        scores[row] = -np.inf
+        limit = min(limit, count - 1)
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[idx], round(float(scores[idx]), 4)) for idx in top]
+
+    def __contains__(self, plant_id: int) -> bool:
+        return plant_id in self._owners
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+# Создаем синглтон индекса
+similarity_index = SimilarityIndex()
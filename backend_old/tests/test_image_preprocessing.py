@@ -0,0 +1,70 @@
+import io
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from transformers import ViTImageProcessor
+
+from services.ai_service import VENDORED_PROCESSOR_PATH
+from services.image_preprocessing import ImagePreprocessor, decode_image
+
+# Без draft расхождение - только округление float32 (как в scripts/check_preprocessing.py)
+TOLERANCE = 1e-5
+SIZES = [(224, 224), (640, 480), (301, 37), (1, 1), (4032, 3024)]
+MODES = ["RGB", "RGBA", "L", "P", "CMYK"]
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return ViTImageProcessor.from_pretrained(VENDORED_PROCESSOR_PATH)
+
+
+@pytest.fixture(scope="module")
+def preprocessor(processor):
+    return ImagePreprocessor.from_processor(processor)
+
+
+def _image(size, mode, seed=0):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    # Плавный градиент поверх шума: resize усредняет соседние пиксели по-разному
+    pixels[..., 0] = (np.arange(size[0]) * 255 // max(size[0] - 1, 1)).astype(np.uint8)
+    return Image.fromarray(pixels, "RGB").convert(mode)
+
+
+def _reference(processor, images):
+    return processor(images=images, return_tensors="pt")["pixel_values"]
+
+
+def test_from_processor_uses_vendored_config(processor, preprocessor):
+    assert preprocessor.size == (processor.size["width"], processor.size["height"])
+    assert preprocessor.resample == int(processor.resample)
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("size", SIZES)
+def test_matches_vit_image_processor(processor, preprocessor, size, mode):
+    image = decode_image(_image(size, mode))
+    reference = _reference(processor, [image])
+    fast = preprocessor([image])
+    assert fast.dtype == torch.float32
+    assert fast.shape == reference.shape
+    assert (fast - reference).abs().max().item() <= TOLERANCE
+
+
+def test_batch_matches_vit_image_processor(processor, preprocessor):
+    images = [decode_image(_image(size, "RGB", seed)) for seed, size in enumerate(SIZES)]
+    reference = _reference(processor, images)
+    fast = preprocessor(images)
+    assert fast.shape == reference.shape
+    assert (fast - reference).abs().max().item() <= TOLERANCE
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+def test_decoded_bytes_match(processor, preprocessor, fmt):
+    buffer = io.BytesIO()
+    _image((800, 600), "RGB").save(buffer, fmt)
+    image = decode_image(buffer.getvalue())
+    assert image.mode == "RGB"
+    assert (preprocessor([image]) - _reference(processor, [image])).abs().max().item() <= TOLERANCE
@@ -25,7 +25,7 @@ class Plant {
         description: json['description'],
         image: json['image'],
         userId: json['user_id'],
-        notes: json['notes'],
+        notes: (json['notes'] as List).cast<Map<String, dynamic>>(),
         createdAt: json['created_at'],
         updatedAt: json['updated_at']);
   }
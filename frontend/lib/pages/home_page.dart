@@ -20,13 +20,14 @@ class _HomePageState extends State<HomePage> {
   void _onDayChanged(DateTime day) {
     setState(() {
       _selectedDay = day;
-      _updateSelectedDayNotes();
     });
+    _loadSelectedDayNotes();
   }
 
   late AuthService _authService;
   late NoteService _noteService;
-  List<Note> notes = [];
+  // Количество заметок по дням видимого месяца - для отметок в календаре
+  Map<DateTime, int> _dayCounts = {};
   List<Note> _selectedDayNotes = [];
   bool _isLoading = false;
   String _error = '';
@@ -57,19 +58,38 @@ class _HomePageState extends State<HomePage> {
     }
   }
 
+  // Вместо загрузки всех заметок: отметки календаря за видимый месяц и заметки выбранного дня
   Future<void> _loadNotes() async {
+    await Future.wait([_loadCalendar(_selectedDay), _loadSelectedDayNotes()]);
+  }
+
+  Future<void> _loadCalendar(DateTime focusedDay) async {
     try {
-      notes = await _noteService.getNotes();
-      _updateSelectedDayNotes();
+      // Месяц с запасом в неделю: календарь показывает дни соседних месяцев
+      final from = DateTime(focusedDay.year, focusedDay.month, 1).subtract(Duration(days: 7));
+      final to = DateTime(focusedDay.year, focusedDay.month + 1, 0).add(Duration(days: 7));
+      final counts = await _noteService.getCalendar(from, to);
+      setState(() {
+        _dayCounts = counts;
+      });
     } catch (e) {
-      _error = e.toString();
+      setState(() {
+        _error = e.toString();
+      });
     }
   }
 
-  void _updateSelectedDayNotes() {
-    setState(() {
-      _selectedDayNotes = notes.where((note) => isSameDay(_selectedDay, note.day)).toList();
-    });
+  Future<void> _loadSelectedDayNotes() async {
+    try {
+      final dayNotes = await _noteService.getDayNotes(_selectedDay);
+      setState(() {
+        _selectedDayNotes = dayNotes;
+      });
+    } catch (e) {
+      setState(() {
+        _error = e.toString();
+      });
+    }
   }
 
   @override
@@ -84,7 +104,8 @@ class _HomePageState extends State<HomePage> {
             HomeCalendar(
               selectedDay: _selectedDay,
               onDayChanged: _onDayChanged,
-              notes: notes, // Передаем все заметки в календарь
+              onPageChanged: _loadCalendar,
+              dayCounts: _dayCounts,
             ),
             HomeNotes(
                 selectedDay: _selectedDay,
@@ -201,12 +222,14 @@ class HomeCalendar extends StatefulWidget {
     super.key,
     required this.selectedDay,
     required this.onDayChanged,
-    required this.notes,
+    required this.onPageChanged,
+    required this.dayCounts,
   });
 
   final DateTime selectedDay;
   final Function(DateTime) onDayChanged;
-  final List<Note> notes; // Список всех заметок
+  final Function(DateTime) onPageChanged;
+  final Map<DateTime, int> dayCounts; // Количество заметок по дням
 
   @override
   State<HomeCalendar> createState() => _HomeCalendarState();
@@ -215,8 +238,9 @@ class HomeCalendar extends StatefulWidget {
 class _HomeCalendarState extends State<HomeCalendar> {
   DateTime _focusedDay = DateTime.now();
 
-  List<Note> _getEventsForDay(DateTime day) {
-    return widget.notes.where((note) => note.day != null && isSameDay(note.day!, day)).toList();
+  List<int> _getEventsForDay(DateTime day) {
+    final count = widget.dayCounts[DateTime(day.year, day.month, day.day)] ?? 0;
+    return List.filled(count, 0);
   }
 
   @override
@@ -242,6 +266,7 @@ class _HomeCalendarState extends State<HomeCalendar> {
         },
         onPageChanged: (focusedDay) {
           _focusedDay = focusedDay; // Обновляем фокусированный день при листании
+          widget.onPageChanged(focusedDay); // Загружаем отметки нового месяца
         },
         calendarFormat: CalendarFormat.month,
         rowHeight: 35,
@@ -24,6 +24,8 @@ class _NoteCreatePageState extends State<NoteCreatePage> {
   late PlantService _plantService;
   late User _user;
   List<Plant> _plants = [];
+  // Курсор следующей страницы растений (null - загружены все)
+  String? _plantsCursor;
   String _error = '';
   bool _isLoading = false;
   final TextEditingController _titleController = TextEditingController();
@@ -44,11 +46,34 @@ class _NoteCreatePageState extends State<NoteCreatePage> {
       _userService = UserService(_authService);
       _plantService = PlantService(_authService);
       _user = await _userService.getUser();
-      _plants = await _plantService.getPlants();
+      final page = await _plantService.getPlants();
+      setState(() {
+        _plants = page.plants;
+        _plantsCursor = page.nextCursor;
+      });
+    } catch (e) {
+      setState(() {
+        _error = e.toString();
+      });
+    }
+  }
+
+  // Следующая страница растений для списка выбора - по кнопке под ним
+  Future<void> _loadMorePlants() async {
+    if (_plantsCursor == null) {
+      return;
+    }
+    try {
+      final page = await _plantService.getPlants(cursor: _plantsCursor);
+      setState(() {
+        _plants = [..._plants, ...page.plants];
+        _plantsCursor = page.nextCursor;
+      });
     } catch (e) {
       setState(() {
         _error = e.toString();
       });
+      _clearError();
     }
   }
 
@@ -169,6 +194,7 @@ class _NoteCreatePageState extends State<NoteCreatePage> {
               updatePlantId: _updatePlantId,
               updateDay: _updateDay,
               plants: _plants,
+              loadMorePlants: _plantsCursor != null ? _loadMorePlants : null,
             ),
           ),
         ],
@@ -231,6 +257,8 @@ class NoteCreateForm extends StatefulWidget {
   final bool isLoading;
   final String error;
   final List<Plant> plants;
+  // null - все растения уже загружены
+  final Future<void> Function()? loadMorePlants;
 
   NoteCreateForm(
       {required this.createNote,
@@ -240,7 +268,8 @@ class NoteCreateForm extends StatefulWidget {
       required this.textController,
       required this.updatePlantId,
       required this.updateDay,
-      required this.plants});
+      required this.plants,
+      this.loadMorePlants});
 
   @override
   _NoteCreateFormState createState() => _NoteCreateFormState();
@@ -419,6 +448,12 @@ class _NoteCreateFormState extends State<NoteCreateForm> {
             ),
           ],
         ),
+        if (widget.loadMorePlants != null)
+          TextButton(
+            onPressed: widget.loadMorePlants,
+            child: Text('Загрузить еще растения',
+                style: GoogleFonts.mulish(fontSize: 16, color: Theme.of(context).primaryColorLight)),
+          ),
         Padding(
           padding: const EdgeInsets.symmetric(vertical: 10),
           child: Row(
@@ -20,6 +20,9 @@ class _NotesPageState extends State<NotesPage> {
   late NoteService _noteService;
   List<Note> notes = [];
   List<String> days = [];
+  // Курсор следующей страницы заметок (null - загружены все)
+  String? _nextCursor;
+  bool _isLoadingMore = false;
   bool _isLoading = false;
   String _error = '';
   bool _isAuthenticated = false;
@@ -52,13 +55,46 @@ class _NotesPageState extends State<NotesPage> {
 
   Future<void> _loadNotes() async {
     try {
-      notes = await _noteService.getNotes();
-      days = notes.map((note) => note.day!.toIso8601String().substring(0, 10)).toSet().toList();
+      final page = await _noteService.getNotes();
+      notes = page.notes;
+      _nextCursor = page.nextCursor;
+      _updateDays();
     } catch (e) {
       _error = e.toString();
     }
   }
 
+  // Следующая страница заметок - по кнопке в конце списка
+  Future<void> _loadMoreNotes() async {
+    if (_nextCursor == null || _isLoadingMore) {
+      return;
+    }
+    setState(() {
+      _isLoadingMore = true;
+    });
+    try {
+      final page = await _noteService.getNotes(cursor: _nextCursor);
+      setState(() {
+        notes = [...notes, ...page.notes];
+        _nextCursor = page.nextCursor;
+        _updateDays();
+      });
+    } catch (e) {
+      setState(() {
+        _error = e.toString();
+      });
+      await _clearError();
+    } finally {
+      setState(() {
+        _isLoadingMore = false;
+      });
+    }
+  }
+
+  void _updateDays() {
+    days = notes.map((note) => note.day!.toIso8601String().substring(0, 10)).toSet().toList();
+  }
+
   Future<void> _clearError() async {
     await Future.delayed(Duration(seconds: 3));
     if (mounted) {
@@ -110,8 +146,22 @@ class _NotesPageState extends State<NotesPage> {
                   ? const Center(child: CircularProgressIndicator())
                   : ListView.builder(
                       padding: const EdgeInsets.only(bottom: 10, top: 20),
-                      itemCount: days.length,
+                      itemCount: days.length + (_nextCursor != null ? 1 : 0),
                       itemBuilder: (context, index) {
+                        if (index == days.length) {
+                          return Center(
+                            child: _isLoadingMore
+                                ? const CircularProgressIndicator()
+                                : TextButton(
+                                    onPressed: _loadMoreNotes,
+                                    child: Text(
+                                      'Загрузить еще',
+                                      style: GoogleFonts.mulish(
+                                          fontSize: 18, color: Theme.of(context).primaryColorDark),
+                                    ),
+                                  ),
+                          );
+                        }
                         return Container(
                           alignment: Alignment.center,
                           child: Opacity(
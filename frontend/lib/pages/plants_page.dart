@@ -1,6 +1,10 @@
 import 'package:flutter/material.dart';
+import 'package:google_fonts/google_fonts.dart';
 import '../widgets/bottom_navigator.dart';
 import '../widgets/page_title.dart';
+import '../models/plant.dart';
+import '../services/auth_service.dart';
+import '../services/plant_service.dart';
 
 class PlantsPage extends StatefulWidget {
   const PlantsPage({super.key});
@@ -10,16 +14,173 @@ class PlantsPage extends StatefulWidget {
 }
 
 class _PlantsPageState extends State<PlantsPage> {
+  static const String _serverUrl = 'http://10.0.2.2:8000';
+
+  late AuthService _authService;
+  late PlantService _plantService;
+  final ScrollController _scrollController = ScrollController();
+  List<Plant> plants = [];
+  // Курсор следующей страницы растений (null - загружены все)
+  String? _nextCursor;
+  bool _isLoadingMore = false;
+  bool _isLoading = false;
+  String _error = '';
+
+  @override
+  void initState() {
+    super.initState();
+    _scrollController.addListener(_onScroll);
+    _initServicesAndLoadPlants();
+  }
+
+  @override
+  void dispose() {
+    _scrollController.dispose();
+    super.dispose();
+  }
+
+  Future<void> _initServicesAndLoadPlants() async {
+    setState(() {
+      _isLoading = true;
+    });
+
+    try {
+      _authService = await AuthService.create();
+      _plantService = PlantService(_authService);
+      final page = await _plantService.getPlants();
+      plants = page.plants;
+      _nextCursor = page.nextCursor;
+    } catch (e) {
+      _error = e.toString();
+    } finally {
+      setState(() {
+        _isLoading = false;
+      });
+      WidgetsBinding.instance.addPostFrameCallback((_) => _fillViewport());
+    }
+  }
+
+  // Следующая страница подгружается, когда список прокручен почти до конца
+  void _onScroll() {
+    if (_scrollController.position.extentAfter < 300) {
+      _loadMorePlants();
+    }
+  }
+
+  // Если страница не заполняет экран, прокрутки не будет - следующая загружается сразу
+  void _fillViewport() {
+    if (mounted && _scrollController.hasClients && _scrollController.position.maxScrollExtent == 0) {
+      _loadMorePlants();
+    }
+  }
+
+  Future<void> _loadMorePlants() async {
+    if (_nextCursor == null || _isLoadingMore) {
+      return;
+    }
+    setState(() {
+      _isLoadingMore = true;
+    });
+    try {
+      final page = await _plantService.getPlants(cursor: _nextCursor);
+      setState(() {
+        plants = [...plants, ...page.plants];
+        _nextCursor = page.nextCursor;
+      });
+    } catch (e) {
+      setState(() {
+        _error = e.toString();
+      });
+    } finally {
+      setState(() {
+        _isLoadingMore = false;
+      });
+      WidgetsBinding.instance.addPostFrameCallback((_) => _fillViewport());
+    }
+  }
+
+  // Миниатюра изображения: сервер отдает ближайший размер не меньше запрошенного
+  Widget _plantImage(Plant plant) {
+    if (plant.image.isEmpty) {
+      return Icon(Icons.local_florist_outlined, size: 60, color: Theme.of(context).primaryColorDark);
+    }
+    final separator = plant.image.contains('?') ? '&' : '?';
+    return ClipRRect(
+      borderRadius: BorderRadius.circular(15),
+      child: Image.network(
+        '$_serverUrl${plant.image}${separator}size=128',
+        headers: {'Authorization': 'Bearer ${_authService.getToken()}'},
+        width: 60,
+        height: 60,
+        fit: BoxFit.cover,
+        errorBuilder: (context, error, stackTrace) =>
+            Icon(Icons.local_florist_outlined, size: 60, color: Theme.of(context).primaryColorDark),
+      ),
+    );
+  }
+
   @override
   Widget build(BuildContext context) {
     return Scaffold(
       appBar: AppBar(toolbarHeight: 30),
-      body: const Padding(
-        padding: EdgeInsets.symmetric(horizontal: 30),
+      body: Padding(
+        padding: const EdgeInsets.symmetric(horizontal: 30),
         child: Column(
           children: [
-            PageTitle(title: 'Растения'),
-            Text('Растения'),
+            const PageTitle(title: 'Растения'),
+            Expanded(
+              child: _isLoading
+                  ? const Center(child: CircularProgressIndicator())
+                  : ListView.builder(
+                      controller: _scrollController,
+                      padding: const EdgeInsets.only(bottom: 10, top: 20),
+                      itemCount: plants.length + (_nextCursor != null ? 1 : 0),
+                      itemBuilder: (context, index) {
+                        if (index == plants.length) {
+                          return const Center(child: CircularProgressIndicator());
+                        }
+                        final plant = plants[index];
+                        return Container(
+                          margin: const EdgeInsets.only(bottom: 20),
+                          padding: const EdgeInsets.all(15),
+                          decoration: BoxDecoration(
+                            color: Theme.of(context).primaryColorLight,
+                            borderRadius: BorderRadius.circular(25),
+                          ),
+                          child: Row(
+                            children: [
+                              _plantImage(plant),
+                              const SizedBox(width: 15),
+                              Expanded(
+                                child: Column(
+                                  crossAxisAlignment: CrossAxisAlignment.start,
+                                  children: [
+                                    Text(plant.name,
+                                        style: GoogleFonts.mulish(
+                                            fontSize: 20,
+                                            fontWeight: FontWeight.bold,
+                                            color: Theme.of(context).primaryColorDark)),
+                                    if (plant.description.isNotEmpty)
+                                      Text(plant.description,
+                                          maxLines: 2,
+                                          overflow: TextOverflow.ellipsis,
+                                          style: GoogleFonts.mulish(
+                                              fontSize: 16, color: Theme.of(context).primaryColorDark)),
+                                  ],
+                                ),
+                              ),
+                            ],
+                          ),
+                        );
+                      },
+                    ),
+            ),
+            if (_error.isNotEmpty)
+              Padding(
+                padding: const EdgeInsets.symmetric(vertical: 10),
+                child: Text(_error,
+                    style: GoogleFonts.mulish(fontSize: 16, color: Theme.of(context).primaryColorDark)),
+              ),
           ],
         ),
       ),
@@ -11,20 +11,35 @@ class NoteService {
 
   NoteService(this._authService);
 
-  Future<List<Note>> getNotes() async {
+  // Одна страница заметок (не больше PAGE_SIZE на сервере); следующая - по nextCursor
+  Future<NotePage> getNotes({String? cursor, DateTime? dayFrom, DateTime? dayTo}) async {
     final token = _authService.getToken();
     if (token == null) {
       throw Exception('Не авторизован');
     }
     try {
+      final Map<String, String> queryParameters = {};
+      if (cursor != null) {
+        queryParameters['cursor'] = cursor;
+      }
+      if (dayFrom != null) {
+        queryParameters['day_from'] = dayFrom.toIso8601String();
+      }
+      if (dayTo != null) {
+        queryParameters['day_to'] = dayTo.toIso8601String();
+      }
+      final uri = Uri.parse('$baseUrl/get').replace(queryParameters: queryParameters.isEmpty ? null : queryParameters);
       final response = await http.get(
-        Uri.parse('$baseUrl/get'),
+        uri,
         headers: {'Authorization': 'Bearer $token'},
       ).timeout(Duration(seconds: 3));
 
       if (response.statusCode == 200) {
-        final decodedResponse = utf8.decode(response.bodyBytes);
-        return (jsonDecode(decodedResponse)['notes'] as List).map((e) => Note.fromJson(e)).toList();
+        final decodedResponse = jsonDecode(utf8.decode(response.bodyBytes));
+        return NotePage(
+          (decodedResponse['notes'] as List).map((e) => Note.fromJson(e)).toList(),
+          decodedResponse['next_cursor'],
+        );
       } else if (response.statusCode == 401) {
         _authService.clearToken();
         throw Exception('Не авторизован');
@@ -36,6 +51,48 @@ class NoteService {
     }
   }
 
+  // Заметки одного дня (для главной страницы)
+  Future<List<Note>> getDayNotes(DateTime day) async {
+    final dayStart = DateTime(day.year, day.month, day.day);
+    final page = await getNotes(dayFrom: dayStart, dayTo: dayStart.add(Duration(days: 1)));
+    return page.notes;
+  }
+
+  // Количество заметок по дням в интервале [from, to] - для отметок в календаре
+  Future<Map<DateTime, int>> getCalendar(DateTime from, DateTime to) async {
+    final token = _authService.getToken();
+    if (token == null) {
+      throw Exception('Не авторизован');
+    }
+    try {
+      final uri = Uri.parse('$baseUrl/calendar').replace(queryParameters: {
+        'from': from.toIso8601String().substring(0, 10),
+        'to': to.toIso8601String().substring(0, 10),
+      });
+      final response = await http.get(
+        uri,
+        headers: {'Authorization': 'Bearer $token'},
+      ).timeout(Duration(seconds: 3));
+
+      if (response.statusCode == 200) {
+        final decodedResponse = jsonDecode(utf8.decode(response.bodyBytes));
+        final Map<DateTime, int> counts = {};
+        for (final day in decodedResponse['days'] as List) {
+          final date = DateTime.parse(day['day']);
+          counts[DateTime(date.year, date.month, date.day)] = day['count'];
+        }
+        return counts;
+      } else if (response.statusCode == 401) {
+        _authService.clearToken();
+        throw Exception('Не авторизован');
+      } else {
+        throw Exception('Не удалось загрузить календарь');
+      }
+    } catch (e) {
+      throw Exception('Не удалось загрузить календарь: $e');
+    }
+  }
+
   Future<Note> createNote(Note note) async {
     final token = _authService.getToken();
     if (token == null) {
@@ -158,3 +215,10 @@ class NoteService {
     }
   }
 }
+
+class NotePage {
+  final List<Note> notes;
+  final String? nextCursor;
+
+  NotePage(this.notes, this.nextCursor);
+}
@@ -1,3 +1,4 @@
+import 'dart:convert';
 import 'package:http/http.dart' as http;
 import '../models/plant.dart';
 import '../services/auth_service.dart';
@@ -8,19 +9,26 @@ class PlantService {
 
   PlantService(this._authService);
 
-  Future<List<Plant>> getPlants() async {
+  // Одна страница растений (не больше PAGE_SIZE на сервере); курсор следующей - в заголовке X-Next-Cursor
+  Future<PlantPage> getPlants({String? cursor}) async {
     final token = _authService.getToken();
     if (token == null) {
       throw Exception('Не авторизован');
     }
 
     try {
-      final response = await http
-          .get(Uri.parse('$_baseUrl/get'), headers: {'Authorization': 'Bearer $token'}).timeout(Duration(seconds: 5));
+      final uri = Uri.parse('$_baseUrl/get').replace(
+        queryParameters: cursor != null ? {'cursor': cursor} : null,
+      );
+      final response =
+          await http.get(uri, headers: {'Authorization': 'Bearer $token'}).timeout(Duration(seconds: 5));
       if (response.statusCode == 200) {
-        return (response.body as List).map((e) => Plant.fromJson(e)).toList();
+        return PlantPage(
+          (jsonDecode(utf8.decode(response.bodyBytes)) as List).map((e) => Plant.fromJson(e)).toList(),
+          response.headers['x-next-cursor'],
+        );
       } else if (response.statusCode == 404) {
-        return [];
+        return PlantPage([], null);
       } else {
         throw Exception('Failed to load plants');
       }
@@ -29,3 +37,10 @@ class PlantService {
     }
   }
 }
+
+class PlantPage {
+  final List<Plant> plants;
+  final String? nextCursor;
+
+  PlantPage(this.plants, this.nextCursor);
+}